@@ -3,15 +3,61 @@
 A simple AI agent powered by Claude with tool use capabilities.
 """
 
+import io
 import os
-import json
+import sys
+import ast
+import math
+import asyncio
+import hashlib
+import logging
+import operator
+import functools
+import contextvars
+from collections import OrderedDict
 from pathlib import Path
-from claude_client import create_claude_client, load_and_encode_image, get_model_name
+import anthropic
+import orjson
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+import face_embeddings
+import face_identification
+from claude_client import (
+    create_claude_client, load_and_encode_image, encode_many, get_model_name,
+    get_provider_name, prewarm_async_client, close_async_clients, upload_image_async,
+    upload_image_gcs_async, FILES_API_BETA
+)
+
+logger = logging.getLogger(__name__)
 
-# Initialize Claude client (supports Anthropic API, Vertex AI, and Gemini)
-client = create_claude_client()
 MODEL_NAME = get_model_name()
 
+# Limit concurrent Claude requests to stay under provider rate limits
+CLAUDE_CONCURRENCY = int(os.getenv("CLAUDE_CONCURRENCY", "5"))
+# One semaphore per event loop (see _sem)
+_semaphores = {}
+
+# Message Batches API (50% cheaper, results within 24h) is only offered by the Anthropic API
+BATCH_SUPPORTED = get_provider_name() == "anthropic"
+BATCH_POLL_SECONDS = 10
+
+# Retry policy for API calls: the statuses the SDK itself retries (timeouts,
+# conflicts, rate limits, server errors and overloaded), plus connection errors.
+# The SDK's own retries are switched off for these calls (see _retry_client)
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+MAX_API_ATTEMPTS = 6
+
+# Reference images uploaded once through the Files API instead of re-sending
+# base64 on every request (Anthropic API only; opt in with CLAUDE_FILES_API=1)
+USE_FILES_API = os.environ.get("CLAUDE_FILES_API") == "1" and get_provider_name() == "anthropic"
+# Gemini can read images from Cloud Storage; Claude on Vertex only takes base64
+GCS_IMAGE_BUCKET = os.environ.get("GCS_IMAGE_BUCKET") if get_provider_name() == "gemini" else None
+# The Gemini wrapper takes image bytes, so skip the base64 encode/decode round trip
+RAW_IMAGE_BYTES = get_provider_name() == "gemini"
+
+# In-process LRU of vision responses keyed by image content + prompt
+RESPONSE_CACHE_SIZE = 128
+_RESPONSE_CACHE: "OrderedDict[str, str]" = OrderedDict()
+
 # Define tools that the agent can use
 TOOLS = [
     {
@@ -99,8 +145,390 @@ TOOLS = [
     }
 ]
 
+# Static prompts for analyze_people_with_vision (analysis_type "custom" uses the caller's question)
+PEOPLE_ANALYSIS_PROMPTS = {
+    "count": "How many people are in this image? Provide the count and describe their general positions or groupings.",
+    "activities": "What are the people in this image doing? Describe their activities, actions, and any interactions between them.",
+    "detailed": """Analyze each person in this image:
+1. Provide a total count
+2. For each person, describe:
+   - Their position in the image
+   - What they're doing
+   - Their clothing and appearance
+   - Body language and pose
+   - Any notable characteristics""",
+    "faces": """Analyze the faces and expressions in this image:
+1. How many people/faces are visible?
+2. For each person, describe:
+   - Apparent facial expression or emotion
+   - Direction they're looking
+   - Approximate age range
+   - Any distinctive facial features (glasses, facial hair, etc.)
+   - Overall demeanor""",
+    "group": """Analyze the group dynamics in this image:
+1. How many people are present?
+2. How are they positioned relative to each other?
+3. What interactions or relationships can you infer?
+4. What is the social context or setting?
+5. What is the overall mood or atmosphere?
+6. Describe any notable group behaviors."""
+}
+
+
+def _client():
+    """
+    Async Claude client (Anthropic API, Vertex AI, or Gemini) for the running loop.
+
+    Clients are looked up on each call rather than created at import, so
+    separate asyncio.run calls (each with its own loop) don't share one.
+    """
+    return create_claude_client(async_=True)
+
+
+def _retry_client():
+    """
+    _client() with the SDK's own retries off, for calls made under _call_with_retry.
+
+    Otherwise each of the MAX_API_ATTEMPTS attempts would be retried again by
+    the SDK (max_retries defaults to 2). The Gemini wrapper has no SDK retries.
+    """
+    client = _client()
+    return client.with_options(max_retries=0) if hasattr(client, "with_options") else client
+
+
+def _sem() -> asyncio.Semaphore:
+    """
+    The CLAUDE_CONCURRENCY semaphore for the running event loop.
+
+    A semaphore is tied to the loop it is first waited on, so each loop gets
+    its own; those of closed loops are dropped.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        for stale in [other for other in _semaphores if other.is_closed()]:
+            del _semaphores[stale]
+        semaphore = _semaphores[loop] = asyncio.Semaphore(CLAUDE_CONCURRENCY)
+    return semaphore
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    """Connection errors and RETRYABLE_STATUS_CODES (rate limits, overload, ...) are worth retrying."""
+    if isinstance(exc, anthropic.APIConnectionError):
+        return True
+    return isinstance(exc, anthropic.APIStatusError) and exc.status_code in RETRYABLE_STATUS_CODES
+
+
+_backoff = wait_exponential_jitter(initial=1, max=30)
+
+
+def _retry_wait(retry_state) -> float:
+    """Wait for the server's retry-after hint when given, else back off exponentially with jitter."""
+    exc = retry_state.outcome.exception()
+    response = getattr(exc, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        return _backoff(retry_state)
+
+
+async def _call_with_retry(fn, *args, can_retry=None, **kwargs):
+    """
+    Await fn(*args, **kwargs), retrying on rate-limit, overload and connection errors.
+
+    Sustained rate limiting delays the call instead of failing the whole
+    agent turn. fn should make its request through _retry_client(), so the
+    SDK doesn't retry each attempt again, and take the concurrency slot
+    itself, so the slot is free while this backs off.
+
+    Args:
+        fn: Coroutine function performing the API call
+        *args, **kwargs: Arguments for fn
+        can_retry: Optional callable; a failed attempt is only retried while it
+            returns True
+
+    Returns:
+        Whatever fn returns
+    """
+    async for attempt in AsyncRetrying(
+        wait=_retry_wait,
+        stop=stop_after_attempt(MAX_API_ATTEMPTS),
+        retry=retry_if_exception(
+            lambda exc: _is_retryable(exc) and (can_retry is None or can_retry())),
+        reraise=True,
+    ):
+        with attempt:
+            return await fn(*args, **kwargs)
+
+
+async def _create_message(**kwargs):
+    """
+    Call client.messages.create under the shared concurrency limit.
+
+    Args:
+        **kwargs: Arguments passed through to messages.create
+
+    Returns:
+        The API response message
+    """
+    if USE_FILES_API:
+        kwargs.setdefault("extra_headers", {"anthropic-beta": FILES_API_BETA})
+
+    async def create_once():
+        # Release the slot between attempts, so backing off doesn't hold it
+        async with _sem():
+            return await _retry_client().messages.create(**kwargs)
+
+    return await _call_with_retry(create_once)
+
+
+async def _load_image(image_path: str):
+    """
+    Load an image off the event loop, as raw bytes when the provider takes them.
+
+    Returns:
+        Tuple of (image_data, media_type) from load_and_encode_image
+    """
+    return await asyncio.to_thread(load_and_encode_image, image_path, raw=RAW_IMAGE_BYTES)
+
+
+async def _image_block(image_path: str, image_data, media_type: str) -> dict:
+    """
+    Build the image content block for a request.
+
+    With the Files API enabled the image is uploaded once and referenced by
+    file_id, and with GCS_IMAGE_BUCKET set (Gemini) it is referenced by its
+    gs:// URI; otherwise it is sent inline as base64.
+
+    Args:
+        image_path: Path to the image file
+        image_data: Image data from _load_image (base64, or bytes for Gemini)
+        media_type: Media type from load_and_encode_image
+
+    Returns:
+        Image content block
+    """
+    if USE_FILES_API:
+        file_id = await upload_image_async(_client(), image_path)
+        return {"type": "image", "source": {"type": "file", "file_id": file_id}}
+    if GCS_IMAGE_BUCKET:
+        uri, media_type = await upload_image_gcs_async(image_path, GCS_IMAGE_BUCKET)
+        return {"type": "image", "source": {"type": "url", "url": uri, "media_type": media_type}}
+    if isinstance(image_data, bytes):
+        return {"type": "image", "source": {"type": "bytes", "media_type": media_type, "data": image_data}}
+    return {
+        "type": "image",
+        "source": {
+            "type": "base64",
+            "media_type": media_type,
+            "data": image_data
+        }
+    }
+
+
+def _response_cache_key(image_data, prompt: str) -> str:
+    """
+    Build a content-addressed cache key for a vision request.
+
+    Args:
+        image_data: Base64-encoded image data, or raw image bytes
+        prompt: Full prompt text sent with the image
+
+    Returns:
+        Cache key combining SHA-256 digests of the image and the prompt
+    """
+    if isinstance(image_data, str):
+        image_data = image_data.encode('ascii')
+    return (hashlib.sha256(image_data).hexdigest()
+            + hashlib.sha256(prompt.encode('utf-8')).hexdigest())
+
+
+def _get_cached_response(key: str):
+    """Return a cached response (marking it recently used), or None on a miss."""
+    if key not in _RESPONSE_CACHE:
+        return None
+    _RESPONSE_CACHE.move_to_end(key)
+    return _RESPONSE_CACHE[key]
+
+
+def _cache_response(key: str, response_text: str):
+    """Store a response, evicting the least recently used entry when full."""
+    _RESPONSE_CACHE[key] = response_text
+    _RESPONSE_CACHE.move_to_end(key)
+    if len(_RESPONSE_CACHE) > RESPONSE_CACHE_SIZE:
+        _RESPONSE_CACHE.popitem(last=False)
+
+
+def _message_text(message) -> str:
+    """Join the text blocks of a response into one string."""
+    return "".join([block.text for block in message.content if block.type == "text"])
+
+
+async def _stream_message(**kwargs):
+    """
+    Stream a response under the shared concurrency limit, printing text as it arrives.
+
+    Falls back to messages.create for clients without a streaming API (Gemini wrapper).
+
+    Args:
+        **kwargs: Arguments passed through to messages.stream
+
+    Returns:
+        The final, fully accumulated response message
+    """
+    if USE_FILES_API:
+        kwargs.setdefault("extra_headers", {"anthropic-beta": FILES_API_BETA})
+    printed = False
+
+    async def stream_once():
+        nonlocal printed
+        # Release the slot between attempts, so backing off doesn't hold it
+        async with _sem():
+            client = _retry_client()
+            if not hasattr(client.messages, "stream"):
+                return await client.messages.create(**kwargs)
+            async with client.messages.stream(**kwargs) as stream:
+                try:
+                    async for event in stream:
+                        # Text deltas are printed live; tool_use input_json deltas are
+                        # accumulated by the SDK into the final message
+                        if event.type == "text":
+                            if not printed:
+                                print("Response: ", end="")
+                                printed = True
+                            print(event.text, end="", flush=True)
+                finally:
+                    if printed:
+                        print()
+                return await stream.get_final_message()
+
+    # Once text has been printed, a retry would print the response again from
+    # the start, so only failures before the first text event are retried
+    return await _call_with_retry(stream_once, can_retry=lambda: not printed)
+
+
+async def _submit_batch(requests: dict) -> dict:
+    """
+    Submit requests through the Message Batches API and wait for them to finish.
+
+    Args:
+        requests: Mapping of custom_id to messages.create parameters
+
+    Returns:
+        Mapping of custom_id to response message (failed requests are omitted)
+    """
+    # Each call is retried like a real-time request, so one 429 or 529 while
+    # polling doesn't abandon the whole batch
+    async def create_once():
+        async with _sem():
+            return await _retry_client().messages.batches.create(requests=[
+                {"custom_id": custom_id, "params": params}
+                for custom_id, params in requests.items()
+            ])
+
+    async def retrieve_once():
+        async with _sem():
+            return await _retry_client().messages.batches.retrieve(batch.id)
+
+    async def results_once():
+        # Read the whole results stream per attempt, so a retry starts it over
+        async with _sem():
+            return [entry async for entry in await _retry_client().messages.batches.results(batch.id)]
+
+    batch = await _call_with_retry(create_once)
+    print(f"[Batch] Submitted {len(requests)} request(s) as {batch.id}")
+
+    while batch.processing_status != "ended":
+        await asyncio.sleep(BATCH_POLL_SECONDS)
+        batch = await _call_with_retry(retrieve_once)
+
+    results = {}
+    for entry in await _call_with_retry(results_once):
+        if entry.result.type == "succeeded":
+            results[entry.custom_id] = entry.result.message
+        else:
+            print(f"[Batch] Request {entry.custom_id} {entry.result.type}")
+    return results
+
+
+async def analyze_images_batch(paths: list, prompt_builder) -> dict:
+    """
+    Analyze many images in one Message Batches submission.
+
+    Intended for offline workloads such as a photo album, where waiting for the
+    batch is acceptable in exchange for half-price requests. Providers without
+    batch support fall back to concurrent real-time calls.
+
+    Args:
+        paths: List of image file paths
+        prompt_builder: Callable taking an image path and returning the prompt text
+
+    Returns:
+        Mapping of image path to analysis text (or an error message)
+    """
+    requests = {}
+    custom_ids = {}
+    results = {}
+    encoded = await encode_many(paths)
+    for i, (image_path, image) in enumerate(zip(paths, encoded)):
+        if isinstance(image, Exception):
+            results[image_path] = f"Error reading image: {str(image)}"
+            continue
+        image_data, media_type = image
+
+        custom_id = f"image-{i}"
+        custom_ids[custom_id] = image_path
+        requests[custom_id] = {
+            "model": MODEL_NAME,
+            "max_tokens": 2048,
+            "messages": [{
+                "role": "user",
+                "content": [
+                    {
+                        "type": "image",
+                        "source": {
+                            "type": "base64",
+                            "media_type": media_type,
+                            "data": image_data
+                        }
+                    },
+                    {
+                        "type": "text",
+                        "text": prompt_builder(image_path)
+                    }
+                ]
+            }]
+        }
+
+    if not requests:
+        return results
+
+    if BATCH_SUPPORTED:
+        messages = await _submit_batch(requests)
+    else:
+        custom_id_list = list(requests)
+        responses = await asyncio.gather(
+            *[_create_message(**requests[custom_id]) for custom_id in custom_id_list],
+            return_exceptions=True
+        )
+        messages = {
+            custom_id: response
+            for custom_id, response in zip(custom_id_list, responses)
+            if not isinstance(response, Exception)
+        }
+
+    for custom_id, image_path in custom_ids.items():
+        message = messages.get(custom_id)
+        if message is None:
+            results[image_path] = "Error analyzing image: request failed"
+            continue
+        results[image_path] = _message_text(message)
+
+    return results
 
-def analyze_image_with_vision(image_path: str, question: str = None) -> str:
+
+async def analyze_image_with_vision(image_path: str, question: str = None) -> str:
     """
     Analyze an image using Claude's vision capabilities.
 
@@ -113,7 +541,7 @@ def analyze_image_with_vision(image_path: str, question: str = None) -> str:
     """
     try:
         # Read and encode the image (handles HEIC conversion)
-        image_data, media_type = load_and_encode_image(image_path)
+        image_data, media_type = await _load_image(image_path)
 
         # Create the prompt
         if question:
@@ -121,22 +549,20 @@ def analyze_image_with_vision(image_path: str, question: str = None) -> str:
         else:
             prompt = "Please analyze this image and provide a detailed description of what you see."
 
+        cache_key = _response_cache_key(image_data, prompt)
+        cached = _get_cached_response(cache_key)
+        if cached is not None:
+            return cached
+
         # Call Claude with vision
-        message = client.messages.create(
+        message = await _create_message(
             model=MODEL_NAME,
             max_tokens=2048,
             messages=[
                 {
                     "role": "user",
                     "content": [
-                        {
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": media_type,
-                                "data": image_data
-                            }
-                        },
+                        await _image_block(image_path, image_data, media_type),
                         {
                             "type": "text",
                             "text": prompt
@@ -147,11 +573,9 @@ def analyze_image_with_vision(image_path: str, question: str = None) -> str:
         )
 
         # Extract the response
-        response_text = ""
-        for block in message.content:
-            if hasattr(block, 'text'):
-                response_text += block.text
+        response_text = _message_text(message)
 
+        _cache_response(cache_key, response_text)
         return response_text
 
     except FileNotFoundError:
@@ -160,7 +584,7 @@ def analyze_image_with_vision(image_path: str, question: str = None) -> str:
         return f"Error analyzing image: {str(e)}"
 
 
-def analyze_people_with_vision(image_path: str, analysis_type: str, custom_question: str = None) -> str:
+async def analyze_people_with_vision(image_path: str, analysis_type: str, custom_question: str = None) -> str:
     """
     Analyze people in an image using Claude's vision capabilities.
 
@@ -174,56 +598,26 @@ def analyze_people_with_vision(image_path: str, analysis_type: str, custom_quest
     """
     try:
         # Read and encode the image (handles HEIC conversion)
-        image_data, media_type = load_and_encode_image(image_path)
+        image_data, media_type = await _load_image(image_path)
 
-        # Create prompts based on analysis type
-        prompts = {
-            "count": "How many people are in this image? Provide the count and describe their general positions or groupings.",
-            "activities": "What are the people in this image doing? Describe their activities, actions, and any interactions between them.",
-            "detailed": """Analyze each person in this image:
-1. Provide a total count
-2. For each person, describe:
-   - Their position in the image
-   - What they're doing
-   - Their clothing and appearance
-   - Body language and pose
-   - Any notable characteristics""",
-            "faces": """Analyze the faces and expressions in this image:
-1. How many people/faces are visible?
-2. For each person, describe:
-   - Apparent facial expression or emotion
-   - Direction they're looking
-   - Approximate age range
-   - Any distinctive facial features (glasses, facial hair, etc.)
-   - Overall demeanor""",
-            "group": """Analyze the group dynamics in this image:
-1. How many people are present?
-2. How are they positioned relative to each other?
-3. What interactions or relationships can you infer?
-4. What is the social context or setting?
-5. What is the overall mood or atmosphere?
-6. Describe any notable group behaviors.""",
-            "custom": custom_question if custom_question else "Describe the people in this image."
-        }
+        prompt = PEOPLE_ANALYSIS_PROMPTS.get(analysis_type)
+        if prompt is None:
+            prompt = custom_question if custom_question else "Describe the people in this image."
 
-        prompt = prompts.get(analysis_type, prompts["custom"])
+        cache_key = _response_cache_key(image_data, prompt)
+        cached = _get_cached_response(cache_key)
+        if cached is not None:
+            return cached
 
         # Call Claude with vision
-        message = client.messages.create(
+        message = await _create_message(
             model=MODEL_NAME,
             max_tokens=2048,
             messages=[
                 {
                     "role": "user",
                     "content": [
-                        {
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": media_type,
-                                "data": image_data
-                            }
-                        },
+                        await _image_block(image_path, image_data, media_type),
                         {
                             "type": "text",
                             "text": prompt
@@ -234,11 +628,9 @@ def analyze_people_with_vision(image_path: str, analysis_type: str, custom_quest
         )
 
         # Extract the response
-        response_text = ""
-        for block in message.content:
-            if hasattr(block, 'text'):
-                response_text += block.text
+        response_text = _message_text(message)
 
+        _cache_response(cache_key, response_text)
         return response_text
 
     except FileNotFoundError:
@@ -247,7 +639,7 @@ def analyze_people_with_vision(image_path: str, analysis_type: str, custom_quest
         return f"Error analyzing people in image: {str(e)}"
 
 
-def identify_people_from_database(image_path: str) -> str:
+async def identify_people_from_database(image_path: str) -> str:
     """
     Identify people in an image using the face database.
 
@@ -257,10 +649,8 @@ def identify_people_from_database(image_path: str) -> str:
     Returns:
         Identification results
     """
-    DATABASE_FILE = "face_database.json"
-
-    # Check if database exists
-    if not os.path.exists(DATABASE_FILE):
+    if not (os.path.exists(face_identification.DATABASE_FILE)
+            or os.path.exists(face_identification.LEGACY_DATABASE_FILE)):
         return """Face database not found. To use person identification:
 
 1. Run: python face_identification.py
@@ -269,121 +659,216 @@ def identify_people_from_database(image_path: str) -> str:
 
 The database stores reference images and facial descriptions to enable identification."""
 
-    # Load database
+    # Load database (parsed once per file modification; a legacy JSON
+    # database is imported on first use)
     try:
-        with open(DATABASE_FILE, 'r') as f:
-            db = json.load(f)
+        db = face_identification.load_database()
     except Exception as e:
         return f"Error loading database: {str(e)}"
 
-    if not db.get("people"):
+    if not len(db):
         return "Face database is empty. Add people using: python face_identification.py"
 
+    # Embeddings are matched locally by face_identification instead of by Claude
+    if face_embeddings.embeddings_available() and db.embedded:
+        result = await asyncio.to_thread(face_identification.identify_person_in_image, image_path)
+        return result["error"] if isinstance(result, dict) else result
+
+    if not any(db.descriptions):
+        return ("The face database only has face embeddings. Install the local face model to use it: "
+                "pip install insightface onnxruntime opencv-python-headless numpy")
+
+    # With the local detector available, don't ask Claude about a photo without faces
+    if face_embeddings.embeddings_available():
+        try:
+            if not await asyncio.to_thread(face_embeddings.has_faces, image_path):
+                return "No faces detected in the image."
+        except FileNotFoundError:
+            return f"Error: Image not found at {image_path}"
+
     # Read target image (handles HEIC conversion)
     try:
-        target_image_data, target_media_type = load_and_encode_image(image_path)
+        target_image_data, target_media_type = await _load_image(image_path)
     except FileNotFoundError:
         return f"Error: Image not found at {image_path}"
     except Exception as e:
         return f"Error reading image: {str(e)}"
 
-    # Build comparison prompt
-    people_descriptions = "\n\n".join([
-        f"Person {i+1} - {person['name']}:\n{person['facial_description']}"
-        for i, person in enumerate(db['people'])
-    ])
-
-    prompt = f"""Compare the people in this image against these known individuals from the user's personal photo database:
-
-{people_descriptions}
-
-For each person visible in the image:
-1. Describe their appearance
-2. Determine if they match any of the known individuals
-3. Provide confidence level (high/medium/low) for any matches
-4. Explain the reasoning
-
-Format as:
-PERSON 1:
-- Match: [name or "Unknown"]
-- Confidence: [High/Medium/Low]
-- Reasoning: [explanation]
-
-Be careful and thorough. Only claim high confidence if features clearly match."""
+    reference, instructions = face_identification.identification_blocks()
+    cache_key = _response_cache_key(target_image_data, reference["text"] + instructions["text"])
+    cached = _get_cached_response(cache_key)
+    if cached is not None:
+        return cached
 
     # Call Claude for identification
     try:
-        message = client.messages.create(
+        message = await _create_message(
             model=MODEL_NAME,
             max_tokens=2048,
             messages=[{
                 "role": "user",
                 "content": [
-                    {
-                        "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": target_media_type,
-                            "data": target_image_data
-                        }
-                    },
-                    {
-                        "type": "text",
-                        "text": prompt
-                    }
+                    reference,
+                    await _image_block(image_path, target_image_data, target_media_type),
+                    instructions
                 ]
             }]
         )
 
-        result = ""
-        for block in message.content:
-            if hasattr(block, 'text'):
-                result += block.text
-
-        return f"Identification results (comparing against {len(db['people'])} people in database):\n\n{result}"
+        result = f"Identification results (comparing against {len(db)} people in database):\n\n{_message_text(message)}"
+        _cache_response(cache_key, result)
+        return result
 
     except Exception as e:
         return f"Error during identification: {str(e)}"
 
 
-def execute_tool(tool_name: str, tool_input: dict) -> str:
+def _get_weather(tool_input: dict) -> str:
+    """Mock weather lookup - in production, call a real weather API."""
+    location = tool_input["location"]
+    return f"The weather in {location} is sunny and 72°F"
+
+
+# Operators and names the calculate tool accepts; anything else is rejected
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+_UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+_MATH_FUNCTIONS = {name: getattr(math, name) for name in (
+    "sqrt", "exp", "log", "log2", "log10",
+    "sin", "cos", "tan", "asin", "acos", "atan", "atan2",
+    "sinh", "cosh", "tanh", "degrees", "radians", "hypot",
+    "fabs", "floor", "ceil", "trunc",
+)}
+_MATH_CONSTANTS = {name: getattr(math, name) for name in ("pi", "e", "tau")}
+# Every operand and intermediate result must fit in this many bits, which keeps
+# expressions like 9**9**9 and (9**9999)**9999 from running for minutes
+_MAX_INT_BITS = 4096
+
+
+def _check_number(value):
+    """Reject results that aren't numbers or are integers too large to work with."""
+    if type(value) not in (int, float, complex):
+        raise ValueError(f"Expression must produce a number, not {type(value).__name__}")
+    if type(value) is int and value.bit_length() > _MAX_INT_BITS:
+        raise ValueError(f"Result too large (max: {_MAX_INT_BITS} bits)")
+    return value
+
+
+def _math_name(node: ast.AST, names: dict):
+    """Look up a bare name (pi, sqrt) or math.<name> in names, or return None."""
+    if isinstance(node, ast.Name):
+        return names.get(node.id)
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == "math":
+        return names.get(node.attr)
+    return None
+
+
+def _eval_math_node(node: ast.AST):
     """
-    Execute a tool and return the result.
-    In a real agent, these would call actual APIs or perform real actions.
+    Evaluate a parsed arithmetic expression node.
+
+    Args:
+        node: AST node from ast.parse(..., mode='eval')
+
+    Returns:
+        Numeric result
+
+    Raises:
+        ValueError: If the expression uses anything besides numbers, arithmetic
+            operators, and the whitelisted math functions and constants, or if
+            an integer grows beyond _MAX_INT_BITS
     """
-    if tool_name == "get_weather":
-        location = tool_input["location"]
-        # Mock response - in production, call a real weather API
-        return f"The weather in {location} is sunny and 72°F"
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float, complex):
+        return _check_number(node.value)
 
-    elif tool_name == "calculate":
-        expression = tool_input["expression"]
-        try:
-            # Safe evaluation of simple math expressions
-            result = eval(expression, {"__builtins__": {}}, {})
-            return f"Result: {result}"
-        except Exception as e:
-            return f"Error calculating: {str(e)}"
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        left = _eval_math_node(node.left)
+        right = _eval_math_node(node.right)
+        # Refuse integer powers whose result would be too large before computing them
+        if (isinstance(node.op, ast.Pow) and type(left) is int and type(right) is int
+                and right > 0 and (abs(left).bit_length() - 1) * right >= _MAX_INT_BITS):
+            raise ValueError(f"Result too large (max: {_MAX_INT_BITS} bits)")
+        return _check_number(_BINARY_OPERATORS[type(node.op)](left, right))
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        return _check_number(_UNARY_OPERATORS[type(node.op)](_eval_math_node(node.operand)))
+
+    constant = _math_name(node, _MATH_CONSTANTS)
+    if constant is not None:
+        return constant
+
+    if isinstance(node, ast.Call) and not node.keywords:
+        func = _math_name(node.func, _MATH_FUNCTIONS)
+        if func is not None:
+            return _check_number(func(*[_eval_math_node(arg) for arg in node.args]))
+
+    raise ValueError(f"Unsupported expression element: {type(node).__name__}")
 
-    elif tool_name == "analyze_image":
-        image_path = tool_input["image_path"]
-        question = tool_input.get("question")
-        return analyze_image_with_vision(image_path, question)
 
-    elif tool_name == "analyze_people":
-        image_path = tool_input["image_path"]
-        analysis_type = tool_input["analysis_type"]
-        custom_question = tool_input.get("custom_question")
-        return analyze_people_with_vision(image_path, analysis_type, custom_question)
+@functools.lru_cache(maxsize=256)
+def _evaluate_expression(expression: str):
+    """
+    Safely evaluate an arithmetic expression, caching results per source string.
+
+    Args:
+        expression: Expression such as '157 * 23' or 'sqrt(2) * pi'
 
-    elif tool_name == "identify_person":
-        image_path = tool_input["image_path"]
-        return identify_people_from_database(image_path)
+    Returns:
+        Numeric result
+    """
+    return _eval_math_node(ast.parse(expression.strip(), mode="eval").body)
+
+
+def _calculate(tool_input: dict) -> str:
+    """Evaluate a simple math expression."""
+    expression = tool_input["expression"]
+    try:
+        result = _evaluate_expression(expression)
+        return f"Result: {result}"
+    except Exception as e:
+        return f"Error calculating: {str(e)}"
+
+
+# Tool name -> handler. Handlers take the tool input dict and return either the
+# result string or a coroutine producing it.
+_TOOL_HANDLERS = {
+    "get_weather": _get_weather,
+    "calculate": _calculate,
+    "analyze_image": lambda i: analyze_image_with_vision(i["image_path"], i.get("question")),
+    "analyze_people": lambda i: analyze_people_with_vision(
+        i["image_path"], i["analysis_type"], i.get("custom_question")
+    ),
+    "identify_person": lambda i: identify_people_from_database(i["image_path"]),
+}
+
+
+async def execute_tool(tool_name: str, tool_input: dict) -> str:
+    """
+    Execute a tool and return the result.
+    In a real agent, these would call actual APIs or perform real actions.
+    """
+    handler = _TOOL_HANDLERS.get(tool_name)
+    if handler is None:
+        return f"Unknown tool: {tool_name}"
 
-    return f"Unknown tool: {tool_name}"
+    result = handler(tool_input)
+    if asyncio.iscoroutine(result):
+        result = await result
+    return result
 
 
-def run_agent(user_message: str, image_path: str = None, max_turns: int = 10) -> str:
+async def run_agent(user_message: str, image_path: str = None, max_turns: int = 10,
+                    stream: bool = True) -> str:
     """
     Run the agent in an agentic loop, allowing it to use tools autonomously.
 
@@ -391,6 +876,8 @@ def run_agent(user_message: str, image_path: str = None, max_turns: int = 10) ->
         user_message: The user's input/question
         image_path: Optional path to an image to include in the initial message
         max_turns: Maximum number of conversation turns to prevent infinite loops
+        stream: Stream each turn and print text as it arrives. Disable when
+            running several conversations at once so output doesn't interleave.
 
     Returns:
         The agent's final response
@@ -399,17 +886,10 @@ def run_agent(user_message: str, image_path: str = None, max_turns: int = 10) ->
     if image_path:
         try:
             # Load and encode image (handles HEIC conversion)
-            image_data, media_type = load_and_encode_image(image_path)
+            image_data, media_type = await _load_image(image_path)
 
             content = [
-                {
-                    "type": "image",
-                    "source": {
-                        "type": "base64",
-                        "media_type": media_type,
-                        "data": image_data
-                    }
-                },
+                await _image_block(image_path, image_data, media_type),
                 {
                     "type": "text",
                     "text": user_message
@@ -429,49 +909,59 @@ def run_agent(user_message: str, image_path: str = None, max_turns: int = 10) ->
 
     for turn in range(max_turns):
         # Call Claude with tools
-        response = client.messages.create(
-            model=MODEL_NAME,
-            max_tokens=4096,
-            tools=TOOLS,
-            messages=messages
-        )
+        if stream:
+            print(f"Turn {turn + 1}:")
+            response = await _stream_message(
+                model=MODEL_NAME,
+                max_tokens=4096,
+                tools=TOOLS,
+                messages=messages
+            )
+        else:
+            response = await _create_message(
+                model=MODEL_NAME,
+                max_tokens=4096,
+                tools=TOOLS,
+                messages=messages
+            )
+            print(f"Turn {turn + 1}:")
 
-        print(f"Turn {turn + 1}:")
         print(f"Stop reason: {response.stop_reason}")
 
         # Process the response
         if response.stop_reason == "end_turn":
             # Agent is done, extract final text response
-            final_response = ""
-            for block in response.content:
-                if block.type == "text":
-                    final_response += block.text
-            print(f"Final response: {final_response}\n")
+            final_response = _message_text(response)
+            if stream:
+                print()
+            else:
+                print(f"Final response: {final_response}\n")
             return final_response
 
         elif response.stop_reason == "tool_use":
             # Agent wants to use tools
             messages.append({"role": "assistant", "content": response.content})
 
-            # Execute all tool calls
-            tool_results = []
-            for block in response.content:
-                if block.type == "tool_use":
-                    tool_name = block.name
-                    tool_input = block.input
+            tool_blocks = [block for block in response.content if block.type == "tool_use"]
+            for block in tool_blocks:
+                print(f"  Using tool: {block.name}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Input: %s", orjson.dumps(block.input, option=orjson.OPT_INDENT_2).decode())
 
-                    print(f"  Using tool: {tool_name}")
-                    print(f"  Input: {json.dumps(tool_input, indent=2)}")
+            # Tools are independent, so execute all calls from this turn concurrently
+            results = await asyncio.gather(*[
+                execute_tool(block.name, block.input) for block in tool_blocks
+            ])
 
-                    # Execute the tool
-                    result = execute_tool(tool_name, tool_input)
-                    print(f"  Result: {result}\n")
+            tool_results = []
+            for block, result in zip(tool_blocks, results):
+                print(f"  Result ({block.name}): {result}\n")
 
-                    tool_results.append({
-                        "type": "tool_result",
-                        "tool_use_id": block.id,
-                        "content": result
-                    })
+                tool_results.append({
+                    "type": "tool_result",
+                    "tool_use_id": block.id,
+                    "content": result
+                })
 
             # Add tool results to messages
             messages.append({"role": "user", "content": tool_results})
@@ -484,31 +974,286 @@ def run_agent(user_message: str, image_path: str = None, max_turns: int = 10) ->
     return "Agent reached maximum turns without completing the task."
 
 
-def main():
+async def _run_agents_batched(user_messages: list, max_turns: int = 10) -> list:
+    """
+    Run several agent conversations in lockstep through the Message Batches API.
+
+    Each turn, the next request of every unfinished conversation is submitted as
+    one batch; tool calls are then executed locally before the following turn.
+
+    Args:
+        user_messages: List of user messages, one per conversation
+        max_turns: Maximum number of batch turns
+
+    Returns:
+        List of final responses, in the same order as user_messages
+    """
+    conversations = {
+        f"conversation-{i}": [{"role": "user", "content": message}]
+        for i, message in enumerate(user_messages)
+    }
+    final_responses = {
+        custom_id: "Agent reached maximum turns without completing the task."
+        for custom_id in conversations
+    }
+
+    for turn in range(max_turns):
+        if not conversations:
+            break
+
+        print(f"Batch turn {turn + 1}: {len(conversations)} conversation(s)")
+        responses = await _submit_batch({
+            custom_id: {
+                "model": MODEL_NAME,
+                "max_tokens": 4096,
+                "tools": TOOLS,
+                "messages": messages
+            }
+            for custom_id, messages in conversations.items()
+        })
+
+        for custom_id, messages in list(conversations.items()):
+            response = responses.get(custom_id)
+            if response is None:
+                final_responses[custom_id] = "Error: batch request failed"
+                del conversations[custom_id]
+                continue
+
+            if response.stop_reason == "tool_use":
+                messages.append({"role": "assistant", "content": response.content})
+                tool_blocks = [block for block in response.content if block.type == "tool_use"]
+                results = await asyncio.gather(*[
+                    execute_tool(block.name, block.input) for block in tool_blocks
+                ])
+                messages.append({"role": "user", "content": [
+                    {"type": "tool_result", "tool_use_id": block.id, "content": result}
+                    for block, result in zip(tool_blocks, results)
+                ]})
+            else:
+                final_responses[custom_id] = _message_text(response)
+                del conversations[custom_id]
+
+    return [final_responses[f"conversation-{i}"] for i in range(len(user_messages))]
+
+
+# Buffer that print() output from the current task is redirected into, if any
+_task_output = contextvars.ContextVar("_task_output", default=None)
+# Running gather_with_ordered_output calls; sys.stdout is proxied while any
+# are, and _original_stdout is put back once the last one finishes
+_ordered_output_users = 0
+_original_stdout = None
+
+
+class _TaskStdout:
+    """sys.stdout proxy that sends writes from buffered tasks to their own buffer."""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, text):
+        buffer = _task_output.get()
+        return (self._stream if buffer is None else buffer).write(text)
+
+    def flush(self):
+        if _task_output.get() is None:
+            self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+async def gather_with_ordered_output(*coros) -> list:
+    """
+    Run coroutines concurrently while keeping their printed output in order.
+
+    Each coroutine's prints are buffered and written out as one block once it
+    and every coroutine before it have finished, so concurrent conversations
+    read as if they had run one after another.
+
+    Args:
+        *coros: Coroutines to run
+
+    Returns:
+        List of results, in the same order as coros
+    """
+    global _ordered_output_users, _original_stdout
+    if _ordered_output_users == 0:
+        _original_stdout = sys.stdout
+        sys.stdout = _TaskStdout(_original_stdout)
+    _ordered_output_users += 1
+
+    async def run(coro, buffer):
+        # Tasks run in a copy of the context, so this only affects this task
+        _task_output.set(buffer)
+        return await coro
+
+    buffers = [io.StringIO() for _ in coros]
+    tasks = [asyncio.create_task(run(coro, buffer)) for coro, buffer in zip(coros, buffers)]
+    results = []
+    try:
+        for task, buffer in zip(tasks, buffers):
+            try:
+                results.append(await task)
+            finally:
+                print(buffer.getvalue(), end="", flush=True)
+    finally:
+        for task in tasks:
+            task.cancel()
+        _ordered_output_users -= 1
+        if _ordered_output_users == 0:
+            sys.stdout = _original_stdout
+    return results
+
+
+async def _prefetch_images(paths: list, max_concurrency: int = 4):
+    """
+    Load and encode images in the background, warming load_and_encode_image's cache.
+
+    The cache holds claude_client.IMAGE_CACHE_SIZE images, so only that many
+    of the paths stay warm. Errors are ignored here; they surface when a tool
+    actually loads the image.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def prefetch(path):
+        async with semaphore:
+            try:
+                await _load_image(path)
+            except Exception:
+                pass
+
+    await asyncio.gather(*[prefetch(path) for path in paths])
+
+
+async def run_agent_many(messages: list, batch: bool = None, prefetch: list = None) -> list:
+    """
+    Run several independent agent conversations concurrently.
+
+    Claude calls from all conversations share the CLAUDE_CONCURRENCY limit, and
+    each conversation's output is printed as one block, in order.
+
+    Args:
+        messages: List of user messages, one per conversation
+        batch: Route the conversations through the Message Batches API, trading
+            latency for cost. Defaults to the CLAUDE_BATCH=1 environment setting.
+        prefetch: Image paths the conversations will ask about. They are read and
+            encoded while the first Claude turns are in flight, so the image
+            tools find them already loaded instead of adding disk time to each
+            round-trip.
+
+    Returns:
+        List of final responses, in the same order as messages
+    """
+    if batch is None:
+        batch = os.environ.get("CLAUDE_BATCH") == "1"
+
+    prefetch_task = asyncio.create_task(_prefetch_images(prefetch)) if prefetch else None
+    try:
+        if batch:
+            if BATCH_SUPPORTED:
+                return await _run_agents_batched(messages)
+            print("Message Batches API is only available with CLAUDE_PROVIDER=anthropic; running in real time")
+
+        return await gather_with_ordered_output(*[run_agent(m, stream=False) for m in messages])
+    finally:
+        if prefetch_task is not None:
+            prefetch_task.cancel()
+
+
+# Beyond this many questions per request, answer quality starts to drop
+MAX_PROMPTS_PER_REQUEST = 16
+
+
+def _parse_batch_answers(response: str, count: int):
+    """
+    Parse the JSON array of answers returned for a marshaled prompt.
+
+    Returns:
+        List of answer strings, or None if the response isn't a JSON array
+        with one entry per question
+    """
+    start, end = response.find("["), response.rfind("]")
+    if start == -1 or end < start:
+        return None
+    try:
+        answers = orjson.loads(response[start:end + 1])
+    except orjson.JSONDecodeError:
+        return None
+    if not isinstance(answers, list) or len(answers) != count:
+        return None
+    return [answer if isinstance(answer, str) else orjson.dumps(answer).decode() for answer in answers]
+
+
+async def run_agent_batch(prompts: list) -> list:
+    """
+    Answer several small, independent prompts with as few requests as possible.
+
+    Up to MAX_PROMPTS_PER_REQUEST prompts are numbered into a single user turn
+    and answered as a JSON array, so the system prompt, tool definitions and
+    round trip are paid once per group rather than once per prompt. Tools
+    remain available for every question. A group whose reply can't be parsed
+    falls back to one conversation per prompt.
+
+    Args:
+        prompts: List of independent user messages
+
+    Returns:
+        List of answers, in the same order as prompts
+    """
+    async def run_group(group):
+        if len(group) == 1:
+            return [await run_agent(group[0], stream=False)]
+        numbered = "\n".join(f"[{i + 1}] {prompt}" for i, prompt in enumerate(group))
+        response = await run_agent(
+            "Answer each of the following questions independently, using tools where helpful:\n"
+            f"{numbered}\n\n"
+            f"Reply with only a JSON array of {len(group)} strings, where element i is "
+            "the complete answer to question [i+1].",
+            stream=False
+        )
+        answers = _parse_batch_answers(response, len(group))
+        if answers is None:
+            return await run_agent_many(group, batch=False)
+        return answers
+
+    groups = [prompts[i:i + MAX_PROMPTS_PER_REQUEST]
+              for i in range(0, len(prompts), MAX_PROMPTS_PER_REQUEST)]
+    results = await gather_with_ordered_output(*[run_group(group) for group in groups])
+    return [answer for answers in results for answer in answers]
+
+
+async def main():
     """
     Main function demonstrating the agent in action.
     """
+    # AGENT_LOG_LEVEL=DEBUG also prints each tool's input
+    logging.basicConfig(level=os.environ.get("AGENT_LOG_LEVEL", "WARNING").upper(),
+                        format="  %(message)s")
+
+    # CLAUDE_PREWARM=1 opens the API connection while the banner prints
+    prewarm = asyncio.create_task(prewarm_async_client())
+
     print("AI Agent powered by Claude with Vision")
     print("=" * 60)
 
     # Example 1: Using weather tool
-    result1 = run_agent("What's the weather like in San Francisco?")
+    result1 = await run_agent("What's the weather like in San Francisco?")
 
     # Example 2: Using calculator tool
-    result2 = run_agent("What is 157 * 23?")
+    result2 = await run_agent("What is 157 * 23?")
 
     # Example 3: Multi-step reasoning with multiple tools
-    result3 = run_agent(
+    result3 = await run_agent(
         "What's the weather in New York? Also, if I have 5 apples "
         "and buy 3 more, how many do I have?"
     )
 
     # Example 4: Image recognition (if you have a test image)
     # Uncomment and update the path to test image recognition:
-    # result4 = run_agent("What's in this image?", image_path="path/to/your/image.jpg")
+    # result4 = await run_agent("What's in this image?", image_path="path/to/your/image.jpg")
 
     # Or use the analyze_image tool:
-    # result5 = run_agent("Please analyze the image at ./test_image.jpg and tell me what objects you see")
+    # result5 = await run_agent("Please analyze the image at ./test_image.jpg and tell me what objects you see")
 
     # Interactive mode
     print("\n" + "="*60)
@@ -516,25 +1261,60 @@ def main():
     print("To analyze an image, type: image:/path/to/image.jpg What do you see?")
     print("="*60)
 
+    # Each prompt runs as its own task, so a new one can be typed while
+    # earlier ones are still waiting on the API. Only a prompt typed while
+    # nothing else is running streams; prompts queued behind it run without
+    # streaming, and their output is held and printed in the order they were
+    # typed, so conversations never interleave.
+    pending = set()
+    last = None
+
+    async def respond(user_input, stream):
+        # Check if user is providing an image
+        if user_input.startswith("image:"):
+            try:
+                parts = user_input[6:].split(maxsplit=1)
+                img_path = parts[0]
+                question = parts[1] if len(parts) > 1 else "What's in this image?"
+                await run_agent(question, image_path=img_path, stream=stream)
+            except Exception as e:
+                print(f"Error: {e}")
+                print("Format: image:/path/to/image.jpg Your question here")
+        else:
+            await run_agent(user_input, stream=stream)
+
+    async def handle(user_input, previous):
+        if previous is None:
+            await respond(user_input, stream=True)
+            return
+
+        async def queued():
+            await respond(user_input, stream=False)
+            # Hold this output until everything typed earlier has been printed
+            await asyncio.wait([previous])
+
+        await gather_with_ordered_output(queued())
+
     while True:
-        user_input = input("\nYou: ").strip()
+        # input() blocks, so read it on a worker thread to keep the loop running
+        try:
+            user_input = (await asyncio.to_thread(input, "\nYou: ")).strip()
+        except EOFError:
+            user_input = "quit"
         if user_input.lower() in ['quit', 'exit', 'q']:
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
             print("Goodbye!")
             break
         if user_input:
-            # Check if user is providing an image
-            if user_input.startswith("image:"):
-                try:
-                    parts = user_input[6:].split(maxsplit=1)
-                    img_path = parts[0]
-                    question = parts[1] if len(parts) > 1 else "What's in this image?"
-                    run_agent(question, image_path=img_path)
-                except Exception as e:
-                    print(f"Error: {e}")
-                    print("Format: image:/path/to/image.jpg Your question here")
-            else:
-                run_agent(user_input)
+            previous = last if last is not None and not last.done() else None
+            last = asyncio.create_task(handle(user_input, previous))
+            pending.add(last)
+            last.add_done_callback(pending.discard)
 
+    # Pooled connections must be closed on this loop, before asyncio.run ends it
+    prewarm.cancel()
+    await close_async_clients()
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
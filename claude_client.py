@@ -15,58 +15,195 @@ Configure via environment variables:
 """
 
 import os
-import base64
+import asyncio
+import atexit
+import functools
+import hashlib
+import importlib.util
 import io
-from typing import Tuple
-from dotenv import load_dotenv
+import mmap
+import struct
+import threading
+import types
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple, Union
 from PIL import Image
-import pillow_heif
+import pybase64
 
-# Register HEIF opener with PIL to support HEIC images
-pillow_heif.register_heif_opener()
+# pillow_heif (libheif) and .env loading are deferred until first needed, so
+# importing this module stays cheap for callers that never touch HEIC images
+_heif_registered = False
+_heif_lock = threading.Lock()
+_env_loaded = False
 
-# Load environment variables
-load_dotenv()
 
+def _load_env():
+    """Load environment variables from .env once, on first use."""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
 
-def create_claude_client():
+        load_dotenv()
+        _env_loaded = True
+
+
+def _pillow_heif():
+    """
+    Import pillow_heif on first use and register its HEIF opener with PIL.
+
+    Registration happens once per process, even when several encoding
+    threads reach it at the same time; this is the only place it is done.
+
+    Returns:
+        The pillow_heif module
+    """
+    global _heif_registered
+    import pillow_heif
+
+    if not _heif_registered:
+        with _heif_lock:
+            if not _heif_registered:
+                # Register HEIF opener with PIL to support HEIC images
+                pillow_heif.register_heif_opener()
+                # Let libheif decode HEVC tiles on every core
+                pillow_heif.options.DECODE_THREADS = max(4, os.cpu_count() or 4)
+                # Only the primary image is ever sent, so skip reading the
+                # thumbnails, depth maps and auxiliary images iPhones embed
+                pillow_heif.options.THUMBNAILS = False
+                pillow_heif.options.DEPTH_IMAGES = False
+                pillow_heif.options.AUX_IMAGES = False
+                _heif_registered = True
+    return pillow_heif
+
+
+# libjpeg-turbo (SIMD DCT + Huffman) for JPEG encoding, straight from a numpy view
+# of the pixels: simplejpeg (self-contained wheels) or PyTurboJPEG with the native
+# library; otherwise Pillow's encoder is used. Both need numpy.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import simplejpeg
+except ImportError:
+    simplejpeg = None
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB, TJPF_GRAY, TJSAMP_420, TJSAMP_GRAY
+    _turbojpeg = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    _turbojpeg = None
+
+# Default JPEG quality for HEIC conversion (CLAUDE_JPEG_QUALITY overrides it);
+# 4:2:0 chroma subsampling keeps files small with no visible effect on analysis
+HEIC_JPEG_QUALITY = 85
+# Quality reductions tried in turn when a converted HEIC exceeds the size limit
+HEIC_JPEG_QUALITY_STEPS = (0, 10, 20)
+
+
+# Clients shared across create_claude_client calls, keyed by (provider, loop):
+# loop is None for sync clients, and the running event loop for async ones
+_client_cache = {}
+# HTTP client each cached Claude client sends through (None for Gemini), same keys
+_http_clients = {}
+_client_lock = threading.Lock()
+
+
+def create_claude_client(async_: bool = False):
     """
     Factory function to create the appropriate client based on CLAUDE_PROVIDER.
 
+    Args:
+        async_: Return an asyncio client (AsyncAnthropic, AsyncAnthropicVertex,
+            or an async Gemini wrapper) whose messages.create must be awaited
+
+    Clients are created once per provider and reused, so repeated calls share
+    one connection pool. An async client's pooled connections belong to the
+    event loop they were opened on, so async clients are cached per running
+    loop: each asyncio.run gets its own, and those of closed loops are dropped.
+    Call reset_claude_client() after changing the environment (e.g. in tests)
+    to build fresh ones.
+
     Returns:
         Client instance (Anthropic, AnthropicVertex, or Gemini wrapper)
 
     Raises:
         ValueError: If provider is invalid or required credentials are missing
         ImportError: If required packages are not installed
+        RuntimeError: If async_ is set outside a running event loop
     """
-    provider = os.environ.get("CLAUDE_PROVIDER", "anthropic").lower()
+    provider = get_provider_name()
+    loop = asyncio.get_running_loop() if async_ else None
+    key = (provider, loop)
+
+    with _client_lock:
+        for stale in [k for k in _client_cache if k[1] is not None and k[1].is_closed()]:
+            del _client_cache[stale]
+            del _http_clients[stale]
+        if key not in _client_cache:
+            if provider == "anthropic":
+                client, http_client = _create_anthropic_client(async_)
+            elif provider == "vertex":
+                client, http_client = _create_vertex_client(async_)
+            elif provider == "gemini":
+                client, http_client = _create_gemini_client(async_), None
+            else:
+                raise ValueError(
+                    f"Invalid CLAUDE_PROVIDER: '{provider}'. Must be 'anthropic', 'vertex', or 'gemini'.\n"
+                    f"Set CLAUDE_PROVIDER in your .env file."
+                )
+            _client_cache[key] = client
+            _http_clients[key] = http_client
+        return _client_cache[key]
 
-    if provider == "anthropic":
-        return _create_anthropic_client()
-    elif provider == "vertex":
-        return _create_vertex_client()
-    elif provider == "gemini":
-        return _create_gemini_client()
-    else:
-        raise ValueError(
-            f"Invalid CLAUDE_PROVIDER: '{provider}'. Must be 'anthropic', 'vertex', or 'gemini'.\n"
-            f"Set CLAUDE_PROVIDER in your .env file."
-        )
 
+def reset_claude_client():
+    """
+    Drop cached clients, provider and model names and image settings so the
+    next calls re-read the environment.
+    """
+    with _client_lock:
+        _client_cache.clear()
+        _http_clients.clear()
+    get_provider_name.cache_clear()
+    get_model_name.cache_clear()
+    get_max_image_dimension.cache_clear()
+    get_jpeg_quality.cache_clear()
+    _load_and_encode_image_cached.cache_clear()
+
+
+@functools.lru_cache(maxsize=None)
+def get_provider_name() -> str:
+    """
+    Get the configured provider name from CLAUDE_PROVIDER.
+
+    The result is cached; reset_claude_client() clears it.
 
+    Returns:
+        Lowercased provider name (anthropic, vertex, gemini)
+    """
+    _load_env()
+    return os.environ.get("CLAUDE_PROVIDER", "anthropic").lower()
+
+
+@functools.lru_cache(maxsize=None)
 def get_model_name(provider: str = None) -> str:
     """
     Get the model name to use based on provider and CLAUDE_MODEL env var.
 
+    The result is cached; reset_claude_client() clears it.
+
     Args:
         provider: Provider name (anthropic, vertex, gemini)
 
     Returns:
         Model name string
     """
+    _load_env()
     if provider is None:
-        provider = os.environ.get("CLAUDE_PROVIDER", "anthropic").lower()
+        provider = get_provider_name()
 
     # Check for explicit model override
     model = os.environ.get("CLAUDE_MODEL")
@@ -83,18 +220,49 @@ def get_model_name(provider: str = None) -> str:
     return defaults.get(provider, "claude-sonnet-4-5-20250929")
 
 
-def _create_anthropic_client():
+@functools.lru_cache(maxsize=None)
+def get_max_image_dimension() -> int:
+    """
+    Get the longest image edge sent to the API, from CLAUDE_IMAGE_MAX_DIMENSION.
+
+    The result is cached; reset_claude_client() clears it.
+
+    Returns:
+        Maximum width or height in pixels (default: VISION_MAX_DIMENSION)
+    """
+    _load_env()
+    return int(os.environ.get("CLAUDE_IMAGE_MAX_DIMENSION", VISION_MAX_DIMENSION))
+
+
+@functools.lru_cache(maxsize=None)
+def get_jpeg_quality() -> int:
+    """
+    Get the JPEG quality for converted HEIC images, from CLAUDE_JPEG_QUALITY.
+
+    The result is cached; reset_claude_client() clears it.
+
+    Returns:
+        JPEG quality, 1-95 (default: HEIC_JPEG_QUALITY)
+    """
+    _load_env()
+    return min(95, max(1, int(os.environ.get("CLAUDE_JPEG_QUALITY", HEIC_JPEG_QUALITY))))
+
+
+def _create_anthropic_client(async_: bool = False):
     """
     Create an Anthropic API client.
 
+    Args:
+        async_: Return AsyncAnthropic instead of Anthropic
+
     Returns:
-        Anthropic client instance
+        Tuple of (Anthropic or AsyncAnthropic client, the HTTP client it uses)
 
     Raises:
         ValueError: If ANTHROPIC_API_KEY is not set
     """
     try:
-        from anthropic import Anthropic
+        from anthropic import Anthropic, AsyncAnthropic
     except ImportError:
         raise ImportError(
             "anthropic package not found. Install with: pip install anthropic"
@@ -111,22 +279,172 @@ def _create_anthropic_client():
         )
 
     print(f"[Claude Client] Using Anthropic API")
-    return Anthropic(api_key=api_key)
+    if async_:
+        http_client = _create_async_http_client()
+        return AsyncAnthropic(api_key=api_key, http_client=http_client), http_client
+    http_client = _create_http_client()
+    client = Anthropic(api_key=api_key, http_client=http_client)
+    _prewarm(http_client, client.base_url)
+    return client, http_client
+
+
+def _http_client_kwargs() -> dict:
+    """
+    Connection settings shared by the sync and async HTTP clients.
 
+    HTTP/2 (when the h2 package is installed) multiplexes concurrent requests
+    over one TCP+TLS connection, and the larger pool (httpx defaults to 10
+    connections, 5 kept alive) keeps connections warm for concurrent calls.
+    """
+    import anthropic
+
+    # Timeout and Limits come from the SDK so they match the httpx it is built on
+    limits_class = type(anthropic.DEFAULT_CONNECTION_LIMITS)
+    return {
+        "http2": importlib.util.find_spec("h2") is not None,
+        # Same long read timeout as the SDK default; fail fast on connect
+        "timeout": anthropic.Timeout(600.0, connect=5.0),
+        "limits": limits_class(max_connections=64, max_keepalive_connections=32,
+                               keepalive_expiry=60.0),
+    }
 
-def _create_vertex_client():
+
+def _create_http_client():
+    """
+    Create the HTTP client used by sync Claude clients.
+
+    The client is closed at interpreter exit, so its kept-alive connections
+    are shut down cleanly instead of being dropped.
+
+    Returns:
+        anthropic.DefaultHttpxClient instance
+    """
+    import anthropic
+
+    client = anthropic.DefaultHttpxClient(**_http_client_kwargs())
+    atexit.register(client.close)
+    return client
+
+
+def _create_async_http_client():
+    """
+    Create the HTTP client used by async Claude clients.
+
+    Returns:
+        anthropic.DefaultAsyncHttpxClient instance
+    """
+    import anthropic
+
+    return anthropic.DefaultAsyncHttpxClient(**_http_client_kwargs())
+
+
+def _prewarm(http_client, base_url):
+    """
+    Open a connection to the API host in the background when CLAUDE_PREWARM=1.
+
+    The first real request then skips the TCP+TLS handshake. Any response
+    (including an error status) is enough to leave a warm pooled connection.
+
+    Args:
+        http_client: httpx.Client the Claude client sends requests through
+        base_url: API base URL (region-specific for Vertex)
+    """
+    if os.environ.get("CLAUDE_PREWARM") != "1" or http_client is None:
+        return
+
+    def warm():
+        try:
+            http_client.head(str(base_url))
+        except Exception:
+            pass
+
+    threading.Thread(target=warm, daemon=True).start()
+
+
+async def prewarm_async_client():
+    """
+    Async counterpart of the CLAUDE_PREWARM connection warm-up.
+
+    An async HTTP client is bound to the running event loop, so async clients
+    cannot be warmed at creation time; schedule this with asyncio.create_task
+    once the loop is running. It warms the HTTP client create_claude_client
+    built for this loop; Gemini clients have none and are skipped.
+    """
+    if os.environ.get("CLAUDE_PREWARM") != "1":
+        return
+    client = create_claude_client(async_=True)
+    http_client = _http_clients.get((get_provider_name(), asyncio.get_running_loop()))
+    if http_client is None:
+        return
+    try:
+        await http_client.head(str(client.base_url))
+    except Exception:
+        pass
+
+
+async def close_async_clients():
+    """
+    Close the async clients create_claude_client built for the running loop.
+
+    Await this at the end of the coroutine given to asyncio.run: pooled
+    connections can only be closed on the loop that opened them, which an
+    atexit handler cannot do. A later create_claude_client(async_=True) on
+    the same loop builds a fresh client.
+    """
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        keys = [key for key in _client_cache if key[1] is loop]
+        http_clients = [_http_clients.pop(key) for key in keys]
+        for key in keys:
+            del _client_cache[key]
+    for http_client in http_clients:
+        if http_client is not None:
+            await http_client.aclose()
+
+
+async def messages_create_many(client, requests: List[dict],
+                               max_concurrency: int = 5) -> list:
+    """
+    Send independent messages.create requests concurrently.
+
+    Works with any async client from create_claude_client(async_=True); for
+    the Anthropic and Vertex clients the requests share one pooled (HTTP/2
+    when available) connection.
+
+    Args:
+        client: Async client (AsyncAnthropic, AsyncAnthropicVertex, or async Gemini wrapper)
+        requests: messages.create keyword arguments, one dict per request
+        max_concurrency: Maximum requests in flight at once
+
+    Returns:
+        One entry per request, in order: the response, or the exception it raised
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def create(request):
+        async with semaphore:
+            return await client.messages.create(**request)
+
+    return await asyncio.gather(*[create(request) for request in requests],
+                                return_exceptions=True)
+
+
+def _create_vertex_client(async_: bool = False):
     """
     Create a Vertex AI client.
 
+    Args:
+        async_: Return AsyncAnthropicVertex instead of AnthropicVertex
+
     Returns:
-        AnthropicVertex client instance
+        Tuple of (AnthropicVertex or AsyncAnthropicVertex client, the HTTP client it uses)
 
     Raises:
         ValueError: If required Vertex AI credentials are missing
         ImportError: If required packages are not installed
     """
     try:
-        from anthropic import AnthropicVertex
+        from anthropic import AnthropicVertex, AsyncAnthropicVertex
     except ImportError:
         raise ImportError(
             "Vertex AI support not found. Install with:\n"
@@ -150,13 +468,23 @@ def _create_vertex_client():
         )
 
     print(f"[Claude Client] Using Vertex AI Claude (project: {project_id}, region: {region})")
-    return AnthropicVertex(project_id=project_id, region=region)
+    if async_:
+        http_client = _create_async_http_client()
+        client = AsyncAnthropicVertex(project_id=project_id, region=region, http_client=http_client)
+        return client, http_client
+    http_client = _create_http_client()
+    client = AnthropicVertex(project_id=project_id, region=region, http_client=http_client)
+    _prewarm(http_client, client.base_url)
+    return client, http_client
 
 
-def _create_gemini_client():
+def _create_gemini_client(async_: bool = False):
     """
     Create a Gemini client via Vertex AI.
 
+    Args:
+        async_: Make the wrapper's messages.create a coroutine
+
     Returns:
         GeminiWrapper client instance that mimics Anthropic API
 
@@ -190,14 +518,58 @@ def _create_gemini_client():
             "5. Install dependencies: pip install google-cloud-aiplatform"
         )
 
-    # Initialize Vertex AI
-    vertexai.init(project=project_id, location=region)
-
+    # GeminiWrapper runs vertexai.init itself
     model_name = get_model_name("gemini")
     print(f"[Gemini Client] Using Vertex AI Gemini (project: {project_id}, region: {region}, model: {model_name})")
 
     # Return wrapper that provides Anthropic-compatible interface
-    return GeminiWrapper(project_id=project_id, region=region, model_name=model_name)
+    return GeminiWrapper(project_id=project_id, region=region, model_name=model_name, async_=async_)
+
+
+_decode_pool = None
+
+
+def _decode_base64_images(encoded: List[str]) -> List[bytes]:
+    """
+    Decode base64 image payloads, spreading several across a thread pool.
+
+    pybase64 releases the GIL while decoding, so threads run in parallel.
+
+    Args:
+        encoded: Base64-encoded image data
+
+    Returns:
+        Decoded bytes, in the same order
+    """
+    global _decode_pool
+    if len(encoded) <= 1:
+        return [pybase64.b64decode(data) for data in encoded]
+    if _decode_pool is None:
+        _decode_pool = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1))
+    return list(_decode_pool.map(pybase64.b64decode, encoded))
+
+
+class GeminiTextBlock:
+    """Anthropic-style text content block."""
+
+    def __init__(self, text: str):
+        self.type = "text"
+        self.text = text
+
+
+class GeminiResponse:
+    """Anthropic-style message built from a Gemini response."""
+
+    def __init__(self, gemini_response, model_name: str):
+        # Ids only need to be unique, so skip hashing the response text
+        self.id = "gemini-" + uuid.uuid4().hex
+        self.model = model_name
+        self.stop_reason = "end_turn"
+        self.usage = types.SimpleNamespace(
+            input_tokens=0,
+            output_tokens=0
+        )
+        self.content = [GeminiTextBlock(gemini_response.text)]
 
 
 class GeminiWrapper:
@@ -205,16 +577,18 @@ class GeminiWrapper:
     Wrapper for Gemini API that provides an Anthropic-compatible interface.
     """
 
-    def __init__(self, project_id: str, region: str, model_name: str):
+    def __init__(self, project_id: str, region: str, model_name: str, async_: bool = False):
         import vertexai
-        from vertexai.generative_models import GenerativeModel, Part
+        from vertexai.generative_models import Content, GenerativeModel, Part
 
         self.project_id = project_id
         self.region = region
         self.model_name = model_name
+        self.async_ = async_
 
         vertexai.init(project=project_id, location=region)
         self.model = GenerativeModel(model_name)
+        self.Content = Content
         self.Part = Part
 
     class Messages:
@@ -227,10 +601,37 @@ class GeminiWrapper:
             """
             Create a message using Gemini API with Anthropic-compatible interface.
             """
-            from vertexai.generative_models import Content, Part
-            import types
+            gemini_contents = self._convert_messages(messages)
+
+            # Generate response
+            response = self.parent.model.generate_content(
+                gemini_contents,
+                generation_config=self._generation_config(max_tokens, kwargs)
+            )
+
+            return self._convert_response(response)
+
+        @staticmethod
+        def _generation_config(max_tokens: int, kwargs: dict) -> dict:
+            """Map Anthropic sampling arguments to a Gemini generation config."""
+            return {
+                "max_output_tokens": max_tokens,
+                "temperature": kwargs.get("temperature", 1.0),
+            }
+
+        def _convert_messages(self, messages: list) -> list:
+            """Convert Anthropic messages format to Gemini format."""
+            Content, Part = self.parent.Content, self.parent.Part
+
+            # Decode all base64 images up front (in parallel when there are
+            # several), then consume them in message order below
+            decoded_images = iter(_decode_base64_images([
+                item["source"]["data"]
+                for msg in messages if isinstance(msg["content"], list)
+                for item in msg["content"]
+                if item["type"] == "image" and item["source"]["type"] == "base64"
+            ]))
 
-            # Convert Anthropic messages format to Gemini format
             gemini_contents = []
 
             for msg in messages:
@@ -247,12 +648,25 @@ class GeminiWrapper:
                         if item["type"] == "text":
                             parts.append(Part.from_text(item["text"]))
                         elif item["type"] == "image":
-                            # Handle base64 image
-                            image_data = base64.b64decode(item["source"]["data"])
-                            parts.append(Part.from_data(
-                                data=image_data,
-                                mime_type=item["source"]["media_type"]
-                            ))
+                            source = item["source"]
+                            if source["type"] == "bytes":
+                                # Raw bytes from load_and_encode_image(raw=True)
+                                parts.append(Part.from_data(
+                                    data=source["data"],
+                                    mime_type=source["media_type"]
+                                ))
+                            elif source["type"] == "url":
+                                # Cloud Storage image, read by Gemini directly
+                                parts.append(Part.from_uri(
+                                    source["url"],
+                                    mime_type=source["media_type"]
+                                ))
+                            else:
+                                # Handle base64 image
+                                parts.append(Part.from_data(
+                                    data=next(decoded_images),
+                                    mime_type=source["media_type"]
+                                ))
                         elif item["type"] == "tool_result":
                             # Convert tool result to text
                             parts.append(Part.from_text(f"Tool result: {item['content']}"))
@@ -260,66 +674,269 @@ class GeminiWrapper:
                 if parts:
                     gemini_contents.append(Content(role=role, parts=parts))
 
-            # Generate response
-            response = self.parent.model.generate_content(
-                gemini_contents,
-                generation_config={
-                    "max_output_tokens": max_tokens,
-                    "temperature": kwargs.get("temperature", 1.0),
-                }
-            )
+            return gemini_contents
 
-            # Convert Gemini response to Anthropic format
-            class MockResponse:
-                def __init__(self, gemini_response, model_name):
-                    self.id = "gemini-" + str(hash(gemini_response.text))
-                    self.model = model_name
-                    self.stop_reason = "end_turn"
-                    self.usage = types.SimpleNamespace(
-                        input_tokens=0,
-                        output_tokens=0
-                    )
+        def _convert_response(self, response):
+            """Convert Gemini response to Anthropic format."""
+            return GeminiResponse(response, self.parent.model_name)
 
-                    # Create content blocks
-                    class TextBlock:
-                        def __init__(self, text):
-                            self.type = "text"
-                            self.text = text
+    class AsyncMessages(Messages):
+        """Async Messages API wrapper for Gemini."""
+
+        async def create(self, model: str, max_tokens: int, messages: list, tools=None, **kwargs):
+            """
+            Create a message using Gemini's async API with Anthropic-compatible interface.
+            """
+            gemini_contents = self._convert_messages(messages)
 
-                    self.content = [TextBlock(gemini_response.text)]
+            response = await self.parent.model.generate_content_async(
+                gemini_contents,
+                generation_config=self._generation_config(max_tokens, kwargs)
+            )
 
-            return MockResponse(response, self.parent.model_name)
+            return self._convert_response(response)
 
     @property
     def messages(self):
         """Return messages API."""
+        if self.async_:
+            return self.AsyncMessages(self)
         return self.Messages(self)
 
 
-def load_and_encode_image(file_path: str, max_size_mb: float = 5.0, max_dimension: int = 8000) -> Tuple[str, str]:
+# Beta flag required for uploading to and referencing the Anthropic Files API
+FILES_API_BETA = "files-api-2025-04-14"
+
+# Files API ids of uploaded images, keyed by (path, modification time)
+_uploaded_file_ids = {}
+
+
+def _image_upload_file(file_path: str) -> tuple:
+    """
+    Prepare an image for Files API upload.
+
+    The API-ready bytes (HEIC converted, oversized images downscaled) are
+    uploaded rather than the original file.
+
+    Args:
+        file_path: Path to the image file
+
+    Returns:
+        Tuple of (filename, file_bytes, media_type) accepted by files.upload
+    """
+    image_data, media_type = load_and_encode_image(file_path)
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    filename = f"{stem}.{media_type.split('/')[-1]}"
+    return filename, pybase64.b64decode(image_data), media_type
+
+
+def upload_image(client, file_path: str) -> str:
+    """
+    Upload an image once through the Files API and return its file_id.
+
+    Reference it in messages as {"type": "image", "source": {"type": "file",
+    "file_id": ...}} and send the FILES_API_BETA header with the request.
+
+    Args:
+        client: Anthropic client
+        file_path: Path to the image file
+
+    Returns:
+        Files API file_id (memoized per path and modification time)
+    """
+    key = (file_path, os.path.getmtime(file_path))
+    if key not in _uploaded_file_ids:
+        uploaded = client.beta.files.upload(file=_image_upload_file(file_path), betas=[FILES_API_BETA])
+        _uploaded_file_ids[key] = uploaded.id
+    return _uploaded_file_ids[key]
+
+
+async def upload_image_async(client, file_path: str) -> str:
+    """
+    Async variant of upload_image for AsyncAnthropic clients.
+
+    Args:
+        client: AsyncAnthropic client
+        file_path: Path to the image file
+
+    Returns:
+        Files API file_id (memoized per path and modification time)
+    """
+    key = (file_path, os.path.getmtime(file_path))
+    if key not in _uploaded_file_ids:
+        uploaded = await client.beta.files.upload(file=_image_upload_file(file_path), betas=[FILES_API_BETA])
+        _uploaded_file_ids[key] = uploaded.id
+    return _uploaded_file_ids[key]
+
+
+# gs:// URIs of images uploaded for Gemini, keyed by SHA-256 of the uploaded bytes
+_gcs_image_uris = {}
+
+
+def upload_image_gcs(file_path: str, bucket_name: str) -> Tuple[str, str]:
+    """
+    Upload an image to Cloud Storage once and return its gs:// URI.
+
+    Gemini reads gs:// images directly, so requests reference the object
+    instead of carrying base64 data. Objects are named by content hash, so
+    re-running over the same photos reuses earlier uploads.
+
+    Args:
+        file_path: Path to the image file
+        bucket_name: Cloud Storage bucket to upload into
+
+    Returns:
+        Tuple of (gs_uri, media_type)
+    """
+    filename, data, media_type = _image_upload_file(file_path)
+    digest = hashlib.sha256(data).hexdigest()
+    if digest not in _gcs_image_uris:
+        from google.cloud import storage
+
+        extension = os.path.splitext(filename)[1]
+        blob = storage.Client().bucket(bucket_name).blob(f"imagizer/{digest}{extension}")
+        if not blob.exists():
+            blob.upload_from_string(data, content_type=media_type)
+        _gcs_image_uris[digest] = f"gs://{bucket_name}/{blob.name}"
+    return _gcs_image_uris[digest], media_type
+
+
+async def upload_image_gcs_async(file_path: str, bucket_name: str) -> Tuple[str, str]:
+    """
+    Async variant of upload_image_gcs; the blocking upload runs on a worker thread.
+
+    Args:
+        file_path: Path to the image file
+        bucket_name: Cloud Storage bucket to upload into
+
+    Returns:
+        Tuple of (gs_uri, media_type)
+    """
+    return await asyncio.to_thread(upload_image_gcs, file_path, bucket_name)
+
+
+# Claude downsamples any image whose long edge exceeds this, so larger images only
+# cost extra upload bytes and input tokens
+VISION_MAX_DIMENSION = 1568
+
+
+def load_and_encode_image(file_path: str, max_size_mb: float = 5.0,
+                          max_dimension: int = None,
+                          raw: bool = False) -> Tuple[Union[str, bytes], str]:
     """
     Load an image file and return base64-encoded data and media type.
     Automatically converts HEIC/HEIF to JPEG for API compatibility.
     Validates image size and dimensions before processing.
 
+    The IMAGE_CACHE_SIZE most recent results are cached per (path,
+    modification time), so repeated calls for an unchanged file skip decoding
+    and encoding. The bound keeps memory to a few full-size encodings, since
+    phone photos near max_size_mb encode to several MB of base64 each.
+
     Args:
         file_path: Path to the image file
         max_size_mb: Maximum file size in MB (default: 5.0)
-        max_dimension: Maximum width or height in pixels (default: 8000)
+        max_dimension: Maximum width or height in pixels; larger images are
+            downscaled with Lanczos resampling (default: get_max_image_dimension(),
+            1568 unless CLAUDE_IMAGE_MAX_DIMENSION is set)
+        raw: Return the API-ready image bytes instead of base64, for providers
+            such as Gemini that take bytes directly (default: False)
 
     Returns:
-        Tuple of (base64_encoded_data, media_type)
+        Tuple of (base64_encoded_data, media_type), or (image_bytes, media_type)
+        when raw is set
 
     Raises:
         FileNotFoundError: If image file doesn't exist
         ValueError: If image exceeds size or dimension limits
         Exception: If image cannot be loaded or encoded
     """
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"Image file not found: {file_path}")
+    if max_dimension is None:
+        max_dimension = get_max_image_dimension()
 
+    # One stat for existence, size and the cache key's modification time
+    try:
+        st = os.stat(file_path)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Image file not found: {file_path}") from None
+
+    return _load_and_encode_image_cached(
+        file_path, st.st_mtime, st.st_size, max_size_mb, max_dimension, raw
+    )
+
+
+def _load_and_encode_or_error(file_path: str) -> Union[Tuple[str, str], Exception]:
+    """load_and_encode_image, returning the exception instead of raising it."""
+    try:
+        return load_and_encode_image(file_path)
+    except Exception as e:
+        return e
+
+
+def load_and_encode_images(paths: List[str]) -> List[Union[Tuple[str, str], Exception]]:
+    """
+    Load and encode several images on a thread pool, for synchronous callers.
+
+    libheif, Pillow's resampling and the JPEG encoders release the GIL while
+    they work, so threads decode HEIC files on every core without pickling
+    results across processes, and the results land in load_and_encode_image's
+    cache.
+
+    Args:
+        paths: Image file paths
+
+    Returns:
+        One entry per path, in order: (base64_encoded_data, media_type), or the
+        exception raised while loading that image
+    """
+    if len(paths) <= 1:
+        return [_load_and_encode_or_error(p) for p in paths]
+    # Register the HEIF opener before fanning out instead of in every worker
+    if any(os.path.exists(p) and _is_heif(p) for p in paths):
+        _pillow_heif()
+    with ThreadPoolExecutor(max_workers=min(len(paths), os.cpu_count() or 1)) as pool:
+        return list(pool.map(_load_and_encode_or_error, paths))
+
+
+async def encode_many(paths: List[str]) -> List[Union[Tuple[str, str], Exception]]:
+    """
+    Async counterpart of load_and_encode_images, started on a worker thread
+    so the event loop keeps running while the images are encoded.
+
+    Args:
+        paths: Image file paths
+
+    Returns:
+        One entry per path, in order: (base64_encoded_data, media_type), or the
+        exception raised while loading that image
+    """
+    return await asyncio.to_thread(load_and_encode_images, paths)
+
+
+# Encoded images kept by load_and_encode_image. Each entry holds a whole
+# base64 string (up to ~1.5x max_size_mb), so the cache is kept small
+IMAGE_CACHE_SIZE = 8
+
+
+@functools.lru_cache(maxsize=IMAGE_CACHE_SIZE)
+def _load_and_encode_image_cached(file_path: str, mtime: float, file_size_bytes: int,
+                                  max_size_mb: float, max_dimension: int,
+                                  raw: bool) -> Tuple[Union[str, bytes], str]:
+    """
+    Cached implementation of load_and_encode_image.
+
+    Args:
+        file_path: Path to the image file
+        mtime: File modification time, part of the cache key so edits invalidate it
+        file_size_bytes: File size from the same stat as mtime
+        max_size_mb: Maximum file size in MB
+        max_dimension: Maximum width or height in pixels
+        raw: Return image bytes instead of base64
+
+    Returns:
+        Tuple of (base64_encoded_data or image_bytes, media_type)
+    """
     # Check file size before processing
-    file_size_bytes = os.path.getsize(file_path)
     file_size_mb = file_size_bytes / (1024 * 1024)
 
     if file_size_mb > max_size_mb:
@@ -332,11 +949,12 @@ def load_and_encode_image(file_path: str, max_size_mb: float = 5.0, max_dimensio
             f"  - Use an image editing tool to reduce file size"
         )
 
-    extension = file_path.lower().split('.')[-1]
+    extension = os.path.splitext(file_path)[1][1:].lower()
 
-    if extension in ['heic', 'heif']:
-        # Convert HEIC/HEIF to JPEG
-        img = Image.open(file_path)
+    if _is_heif(file_path):
+        # Convert HEIC/HEIF to JPEG. Decode with pillow_heif directly so an image
+        # that needs no resizing never becomes a PIL Image.
+        img = _pillow_heif().read_heif(file_path, convert_hdr_to_8bit=True)
 
         # Check dimensions
         width, height = img.size
@@ -344,81 +962,84 @@ def load_and_encode_image(file_path: str, max_size_mb: float = 5.0, max_dimensio
             # Resize to fit within max_dimension while maintaining aspect ratio
             print(f"⚠️  Image dimensions ({width}x{height}) exceed maximum ({max_dimension}px)")
             print(f"   Resizing to fit within {max_dimension}px...")
+            img = img.to_pillow()
             img.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
             width, height = img.size
             print(f"   New dimensions: {width}x{height}")
 
         if img.mode not in ('RGB', 'L'):
-            img = img.convert('RGB')
-        buffer = io.BytesIO()
-        img.save(buffer, format='JPEG', quality=95)
-        buffer.seek(0)
-        encoded_data = buffer.read()
-
-        # Check encoded size
-        encoded_size_mb = len(encoded_data) / (1024 * 1024)
-        if encoded_size_mb > max_size_mb:
-            # Try with lower quality
-            print(f"⚠️  Encoded image too large ({encoded_size_mb:.2f}MB), reducing quality...")
-            buffer = io.BytesIO()
-            img.save(buffer, format='JPEG', quality=85)
-            buffer.seek(0)
-            encoded_data = buffer.read()
-            encoded_size_mb = len(encoded_data) / (1024 * 1024)
-
-            if encoded_size_mb > max_size_mb:
-                raise ValueError(
-                    f"Image still too large after compression: {encoded_size_mb:.2f}MB (max: {max_size_mb}MB)\n"
-                    f"Please use a smaller image or reduce dimensions further."
-                )
-            print(f"   Compressed to {encoded_size_mb:.2f}MB")
+            if img.mode == 'RGBA' and not isinstance(img, Image.Image) and (simplejpeg or _turbojpeg):
+                # Drop alpha straight from the decoded buffer: one copy instead
+                # of to_pillow() followed by convert('RGB')
+                img = np.ascontiguousarray(np.asarray(img)[:, :, :3])
+            else:
+                if not isinstance(img, Image.Image):
+                    img = img.to_pillow()
+                img = img.convert('RGB')
+        encoded_data = _encode_jpeg_under(img, int(max_size_mb * 1024 * 1024))
 
-        image_data = base64.standard_b64encode(encoded_data).decode('utf-8')
+        image_data = encoded_data if raw else pybase64.b64encode_as_string(encoded_data)
         media_type = 'image/jpeg'
     else:
         # Handle standard image formats
-        # First check dimensions
-        img = Image.open(file_path)
-        width, height = img.size
+        # First check dimensions, from the header alone when the format allows;
+        # PIL only opens the file if it has to be resized
+        size = _probe_image_size(file_path)
+        if size is None or max(size) > max_dimension:
+            img = Image.open(file_path)
+            size = img.size
+        width, height = size
 
         if width > max_dimension or height > max_dimension:
             print(f"⚠️  Image dimensions ({width}x{height}) exceed maximum ({max_dimension}px)")
             print(f"   Resizing to fit within {max_dimension}px...")
+            if img.format == 'JPEG':
+                # Let libjpeg decode at 1/2, 1/4 or 1/8 scale (DCT scaling) down to
+                # the smallest size still >= max_dimension, so Lanczos only has to
+                # cover the remaining factor. thumbnail() alone drafts only to 2x
+                # the target, which for typical photos means a full-size decode.
+                img.draft(None, (max_dimension, max_dimension))
             img.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
             width, height = img.size
             print(f"   New dimensions: {width}x{height}")
 
             # Save resized image to buffer
-            buffer = io.BytesIO()
-            format_map = {
-                'jpg': 'JPEG', 'jpeg': 'JPEG',
-                'png': 'PNG', 'gif': 'GIF', 'webp': 'WEBP'
-            }
-            img_format = format_map.get(extension, 'JPEG')
-            if img_format == 'JPEG' and img.mode not in ('RGB', 'L'):
-                img = img.convert('RGB')
-            img.save(buffer, format=img_format, quality=95)
-            buffer.seek(0)
-            encoded_data = buffer.read()
-        else:
-            # Use original file
-            with open(file_path, 'rb') as image_file:
-                encoded_data = image_file.read()
+            img_format = _SAVE_FORMATS.get(extension, 'JPEG')
+            if img_format == 'JPEG':
+                if img.mode not in ('RGB', 'L'):
+                    img = img.convert('RGB')
+                # Same (libjpeg-turbo when available) encoder as the HEIC path
+                encoded_data = _encode_jpeg(img, quality=90)
+            else:
+                buffer = io.BytesIO()
+                img.save(buffer, format=img_format, quality=90)
+                encoded_data = buffer.getvalue()
+
+            # Check encoded size
+            encoded_size_mb = len(encoded_data) / (1024 * 1024)
+            if encoded_size_mb > max_size_mb:
+                raise ValueError(
+                    f"Image is too large: {encoded_size_mb:.2f}MB (max: {max_size_mb}MB)\n"
+                    f"Dimensions: {width}x{height}\n"
+                    f"Please compress or resize the image before uploading."
+                )
 
-        # Check encoded size
-        encoded_size_mb = len(encoded_data) / (1024 * 1024)
-        if encoded_size_mb > max_size_mb:
-            raise ValueError(
-                f"Image is too large: {encoded_size_mb:.2f}MB (max: {max_size_mb}MB)\n"
-                f"Dimensions: {width}x{height}\n"
-                f"Please compress or resize the image before uploading."
-            )
+            image_data = encoded_data if raw else pybase64.b64encode_as_string(encoded_data)
+        elif raw:
+            # The bytes are cached and uploaded later, so they must outlive the
+            # file (no mmap here); unbuffered FileIO reads them in one sized read
+            with open(file_path, 'rb', buffering=0) as f:
+                image_data = f.read()
+        else:
+            # Use original file (already checked against max_size_mb above);
+            # encode it in chunks so the raw bytes are never held in full
+            image_data = _b64encode_file(file_path, file_size_bytes)
 
-        image_data = base64.standard_b64encode(encoded_data).decode('utf-8')
         media_type = get_image_media_type(extension)
 
     # Final check on base64 encoded size
-    base64_size_mb = len(image_data) / (1024 * 1024)
+    base64_size = (len(image_data) + 2) // 3 * 4 if raw else len(image_data)
+    base64_size_mb = base64_size / (1024 * 1024)
     if base64_size_mb > max_size_mb * 1.5:  # Base64 adds ~33% overhead, allow some buffer
         raise ValueError(
             f"Encoded image size ({base64_size_mb:.2f}MB) exceeds limits.\n"
@@ -428,6 +1049,232 @@ def load_and_encode_image(file_path: str, max_size_mb: float = 5.0, max_dimensio
     return image_data, media_type
 
 
+# ISO-BMFF brands of HEVC-coded HEIC stills and sequences
+HEIF_BRANDS = (b'heic', b'heix', b'hevc', b'hevx', b'heim', b'heis', b'hevm', b'hevs')
+# Generic image/sequence brands, shared by HEIF and AVIF files
+HEIF_GENERIC_BRANDS = (b'mif1', b'msf1')
+AVIF_BRANDS = (b'avif', b'avis')
+
+
+def _is_heif(file_path: str) -> bool:
+    """
+    Check whether a file is HEIC/HEIF by its ftyp box rather than its extension.
+
+    iOS exports often carry a .jpg extension while still being HEIC, and those
+    need converting before they can be sent to the API. AVIF uses the same
+    container and often the generic mif1/msf1 major brand, so a file listing
+    an AVIF brand anywhere in its ftyp box is not treated as HEIF.
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(64)
+    if head[4:8] != b'ftyp' or len(head) < 12:
+        return False
+    # Major brand, minor version, then compatible brands to the end of the box
+    box_size = min(struct.unpack('>I', head[:4])[0], len(head))
+    brands = [head[8:12]] + [head[i:i + 4] for i in range(16, box_size - 3, 4)]
+    if any(brand in AVIF_BRANDS for brand in brands):
+        return False
+    return brands[0] in HEIF_BRANDS + HEIF_GENERIC_BRANDS
+
+
+def _probe_image_size(file_path: str) -> Optional[Tuple[int, int]]:
+    """
+    Read an image's dimensions from its header without decoding it.
+
+    Handles PNG, GIF, WebP and JPEG (by scanning to the SOF marker).
+
+    Args:
+        file_path: Path to the image file
+
+    Returns:
+        (width, height), or None if the format isn't recognised or the
+        header is truncated
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(30)
+        if head[:8] == b'\x89PNG\r\n\x1a\n' and head[12:16] == b'IHDR' and len(head) >= 24:
+            return struct.unpack('>II', head[16:24])
+        if head[:6] in (b'GIF87a', b'GIF89a') and len(head) >= 10:
+            return struct.unpack('<HH', head[6:10])
+        if head[:4] == b'RIFF' and head[8:12] == b'WEBP' and len(head) == 30:
+            chunk = head[12:16]
+            if chunk == b'VP8 ':
+                width, height = struct.unpack('<HH', head[26:30])
+                return width & 0x3FFF, height & 0x3FFF
+            if chunk == b'VP8L':
+                bits = int.from_bytes(head[21:25], 'little')
+                return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            if chunk == b'VP8X':
+                return (int.from_bytes(head[24:27], 'little') + 1,
+                        int.from_bytes(head[27:30], 'little') + 1)
+            return None
+        if head[:2] == b'\xff\xd8':
+            return _jpeg_size(f)
+    return None
+
+
+def _jpeg_size(f) -> Optional[Tuple[int, int]]:
+    """
+    Scan JPEG markers for the start-of-frame segment holding the dimensions.
+
+    Args:
+        f: Binary file object positioned anywhere in a JPEG file
+
+    Returns:
+        (width, height), or None if no frame header is found
+    """
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        while code == 0xFF:
+            # Fill bytes before the marker code
+            fill = f.read(1)
+            if not fill:
+                return None
+            code = fill[0]
+        if code == 0xD8 or code == 0x01 or 0xD0 <= code <= 0xD7:
+            # Standalone markers carry no length
+            continue
+        segment = f.read(2)
+        if len(segment) < 2:
+            return None
+        length = struct.unpack('>H', segment)[0]
+        if length < 2:
+            # Corrupt segment; seeking back would loop forever
+            return None
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack('>HH', frame[1:5])
+            return width, height
+        f.seek(length - 2, 1)
+
+
+def _encode_jpeg_under(img, max_bytes: int) -> bytes:
+    """
+    Encode a JPEG at the highest quality step that fits within max_bytes.
+
+    Args:
+        img: PIL Image or pillow_heif HeifFile in RGB or L mode, or an RGB
+            uint8 array when simplejpeg or PyTurboJPEG is available
+        max_bytes: Maximum encoded size
+
+    Returns:
+        JPEG file bytes
+
+    Raises:
+        ValueError: If even the lowest quality step is too large
+    """
+    if simplejpeg is None and _turbojpeg is None and not isinstance(img, Image.Image):
+        # Convert once rather than on every quality step
+        img = img.to_pillow()
+    buffer = io.BytesIO()
+    qualities = [max(1, get_jpeg_quality() - step) for step in HEIC_JPEG_QUALITY_STEPS]
+    for i, quality in enumerate(qualities):
+        if i:
+            print(f"⚠️  Encoded image too large ({encoded_size_mb:.2f}MB), reducing quality...")
+        encoded_data = _encode_jpeg(img, quality=quality, buffer=buffer)
+        encoded_size_mb = len(encoded_data) / (1024 * 1024)
+        if len(encoded_data) <= max_bytes:
+            if i:
+                print(f"   Compressed to {encoded_size_mb:.2f}MB (quality {quality})")
+            return encoded_data
+
+    raise ValueError(
+        f"Image still too large after compression: {encoded_size_mb:.2f}MB "
+        f"(max: {max_bytes / (1024 * 1024):.2f}MB)\n"
+        f"Please use a smaller image or reduce dimensions further."
+    )
+
+
+def _encode_jpeg(img, quality: int, buffer: io.BytesIO = None) -> bytes:
+    """
+    Encode RGB or L pixels as a 4:2:0 JPEG.
+
+    Args:
+        img: PIL Image or pillow_heif HeifFile in RGB or L mode, or an RGB
+            uint8 array when simplejpeg or PyTurboJPEG is available
+        quality: JPEG quality (1-95)
+        buffer: Scratch buffer to reuse across repeated encodes (optional)
+
+    Returns:
+        JPEG file bytes
+    """
+    if simplejpeg is not None:
+        pixels = np.ascontiguousarray(img)
+        if pixels.ndim == 2:
+            return simplejpeg.encode_jpeg(pixels[:, :, np.newaxis], quality=quality,
+                                          colorspace='gray', colorsubsampling='gray',
+                                          fastdct=True)
+        return simplejpeg.encode_jpeg(pixels, quality=quality, colorspace='rgb',
+                                      colorsubsampling='420', fastdct=True)
+
+    if _turbojpeg is not None:
+        pixels = np.asarray(img)
+        if pixels.ndim == 2:
+            return _turbojpeg.encode(pixels[:, :, np.newaxis], quality=quality,
+                                     pixel_format=TJPF_GRAY, jpeg_subsample=TJSAMP_GRAY)
+        return _turbojpeg.encode(pixels, quality=quality,
+                                 pixel_format=TJPF_RGB, jpeg_subsample=TJSAMP_420)
+
+    if not isinstance(img, Image.Image):
+        img = img.to_pillow()
+    if buffer is None:
+        buffer = io.BytesIO()
+    else:
+        buffer.seek(0)
+        buffer.truncate()
+    # Baseline, non-optimized Huffman tables: the fastest encode for bytes that
+    # are only ever sent to the API once
+    img.save(buffer, format='JPEG', quality=quality, subsampling=2,
+             optimize=False, progressive=False)
+    return buffer.getvalue()
+
+
+def _b64encode_file(file_path: str, file_size: int = None) -> str:
+    """
+    Base64-encode a file without reading it into a bytes object first.
+
+    Args:
+        file_path: Path to the file
+        file_size: File size if already known from a stat (skips mapping empty files)
+
+    Returns:
+        Base64-encoded file contents
+    """
+    if file_size is None:
+        file_size = os.path.getsize(file_path)
+    if file_size == 0:
+        return ""
+    # Encode straight from the memory-mapped file into the result string, so
+    # the only full-size copy held in memory is the base64 text itself
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return pybase64.b64encode_as_string(mm)
+
+
+_MEDIA_TYPES = {
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+    'gif': 'image/gif',
+    'webp': 'image/webp',
+    # HEIC/HEIF are always converted to JPEG before sending
+    'heic': 'image/jpeg',
+    'heif': 'image/jpeg'
+}
+
+# PIL save formats for re-encoding resized standard images
+_SAVE_FORMATS = {
+    'jpg': 'JPEG', 'jpeg': 'JPEG',
+    'png': 'PNG', 'gif': 'GIF', 'webp': 'WEBP'
+}
+
+
+@functools.lru_cache(maxsize=32)
 def get_image_media_type(extension: str) -> str:
     """
     Get the media type for an image file extension.
@@ -438,11 +1285,4 @@ def get_image_media_type(extension: str) -> str:
     Returns:
         Media type string (e.g., 'image/jpeg')
     """
-    media_types = {
-        'jpg': 'image/jpeg',
-        'jpeg': 'image/jpeg',
-        'png': 'image/png',
-        'gif': 'image/gif',
-        'webp': 'image/webp'
-    }
-    return media_types.get(extension.lower(), 'image/jpeg')
+    return _MEDIA_TYPES.get(extension.lower(), 'image/jpeg')
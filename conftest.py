@@ -0,0 +1,32 @@
+"""
+Shared pytest fixtures.
+"""
+
+import types
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def modules():
+    """
+    Import the application modules once for the whole test session.
+
+    Importing them loads .env and builds the (cached) Claude clients, so every
+    test shares that work instead of repeating it.
+
+    Returns:
+        Namespace with agent, face_identification, people_recognition and
+        image_recognition_example attributes
+    """
+    import agent
+    import face_identification
+    import people_recognition
+    import image_recognition_example
+
+    return types.SimpleNamespace(
+        agent=agent,
+        face_identification=face_identification,
+        people_recognition=people_recognition,
+        image_recognition_example=image_recognition_example,
+    )
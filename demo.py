@@ -4,6 +4,7 @@ Quick demonstration of agent capabilities including image recognition.
 """
 
 import os
+import asyncio
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -20,21 +21,41 @@ if not os.environ.get("ANTHROPIC_API_KEY"):
     print("\nThen run this script again.")
     exit(1)
 
-from agent import run_agent
+from agent import run_agent_batch
+from claude_client import close_async_clients
 
 print("=" * 60)
 print("AI Agent Demo - Powered by Claude")
 print("=" * 60)
 
-# Demo 1: Simple tool use
-print("\n1. Using the calculator tool:")
-print("-" * 60)
-run_agent("What is 42 * 137?")
+DEMOS = [
+    # Demo 1: Simple tool use
+    ("Using the calculator tool", "What is 42 * 137?"),
+    # Demo 2: Multi-tool reasoning
+    ("Multi-step reasoning",
+     "If the temperature in Paris is 20°C, what is that in Fahrenheit? "
+     "Use the formula (C × 9/5) + 32"),
+]
 
-# Demo 2: Multi-tool reasoning
-print("\n2. Multi-step reasoning:")
-print("-" * 60)
-run_agent("If the temperature in Paris is 20°C, what is that in Fahrenheit? Use the formula (C × 9/5) + 32")
+
+async def run_demos():
+    # The demo questions are independent, so they are sent together as one
+    # request; run_agent_batch falls back to concurrent conversations if the
+    # combined reply can't be parsed
+    try:
+        return await run_agent_batch([prompt for _, prompt in DEMOS])
+    finally:
+        # Close pooled connections on this loop before asyncio.run ends it
+        await close_async_clients()
+
+
+answers = asyncio.run(run_demos())
+
+for i, ((title, prompt), answer) in enumerate(zip(DEMOS, answers), 1):
+    print(f"\n{i}. {title}:")
+    print("-" * 60)
+    print(f"Q: {prompt}")
+    print(f"A: {answer}")
 
 # Demo 3: Image analysis tool
 print("\n3. Image analysis tool (autonomous decision):")
@@ -1,17 +1,32 @@
 #!/usr/bin/env python3
 """
 Demo of the face identification interface (simulated, no API calls).
+
+Run with --fast (or DEMO_FAST=1) to skip the pauses and typing effect,
+e.g. for CI or screen recordings.
 """
 
+import os
+import sys
 import time
 
+FAST = "--fast" in sys.argv or os.environ.get("DEMO_FAST") == "1"
+
+def pause(seconds):
+    """Pause between demo steps (skipped in fast mode)."""
+    if not FAST:
+        time.sleep(seconds)
+
 def print_header(text):
     print("\n" + "=" * 70)
     print(text)
     print("=" * 70)
 
 def simulate_typing(text, delay=0.03):
-    """Simulate typing effect."""
+    """Simulate typing effect (printed all at once in fast mode)."""
+    if FAST:
+        print(text)
+        return
     for char in text:
         print(char, end='', flush=True)
         time.sleep(delay)
@@ -22,12 +37,12 @@ print_header("Face Identification System - Interface Demo")
 print("\n🎬 This demo shows what the interface looks like")
 print("(Simulated - no actual API calls or photos needed)")
 
-time.sleep(1)
+pause(1)
 
 print_header("Scenario: Adding Your First Person to the Database")
 
 print("\nYou run: python face_identification.py\n")
-time.sleep(1)
+pause(1)
 
 print("=" * 70)
 print("Personal Photo Identification System")
@@ -41,7 +56,7 @@ print("• Allow people to request removal at any time")
 print("• This is for PERSONAL use only")
 print("=" * 70)
 
-time.sleep(2)
+pause(2)
 
 print("\n" + "=" * 70)
 print("What would you like to do?")
@@ -55,41 +70,41 @@ print("6. Quit")
 print("=" * 70)
 
 print("\nYour choice (1-6): 1")
-time.sleep(1)
+pause(1)
 
 print("\n📸 Add Person to Database")
 print("-" * 70)
 print("Person's name: Alice")
-time.sleep(0.5)
+pause(0.5)
 print("Path to reference image (clear face photo): ./photos/alice.jpg")
-time.sleep(0.5)
+pause(0.5)
 print("Notes (relationship, etc.) [optional]: My sister")
-time.sleep(0.5)
+pause(0.5)
 print("Do you have Alice's consent to add them? (yes/no): yes")
-time.sleep(1)
+pause(1)
 
 print("\nAnalyzing reference image for Alice...")
-time.sleep(2)
+pause(2)
 
 print("✅ Added Alice to database!")
 print("   Reference image: ./photos/alice.jpg")
 
-time.sleep(2)
+pause(2)
 
 print_header("Scenario: Identifying People in a Photo")
 
 print("\nYou choose: 2. Identify people in a photo\n")
-time.sleep(1)
+pause(1)
 
 print("🔍 Identify People in Photo")
 print("-" * 70)
 print("Path to image to analyze: ./photos/party_2024.jpg")
-time.sleep(1)
+pause(1)
 
 print("\n⏳ Analyzing...")
-time.sleep(2)
+pause(2)
 print("Comparing against 3 people in database...")
-time.sleep(2)
+pause(2)
 
 print("\n" + "=" * 70)
 print("IDENTIFICATION RESULTS")
@@ -102,7 +117,7 @@ simulate_typing("- Confidence: High", 0.05)
 simulate_typing("- Reasoning: Face shape, eye color, hairstyle, and smile match Alice's", 0.02)
 simulate_typing("  reference image very closely. The blue shirt also matches recent photos.", 0.02)
 
-time.sleep(1)
+pause(1)
 
 simulate_typing("\nPERSON 2 IN IMAGE:", 0.05)
 simulate_typing("- Description: Person in the center with glasses, dark hair", 0.02)
@@ -111,7 +126,7 @@ simulate_typing("- Confidence: Medium", 0.05)
 simulate_typing("- Reasoning: Similar facial structure and glasses match Bob, but the", 0.02)
 simulate_typing("  lighting is different and the angle is not optimal, so some uncertainty.", 0.02)
 
-time.sleep(1)
+pause(1)
 
 simulate_typing("\nPERSON 3 IN IMAGE:", 0.05)
 simulate_typing("- Description: Person on the right with blonde hair, smiling", 0.02)
@@ -122,13 +137,13 @@ simulate_typing("  reference collection. Consider adding them if appropriate (wi
 
 print("=" * 70)
 
-time.sleep(2)
+pause(2)
 
 print_header("Using with the AI Agent")
 
 print("\nYou can also use the main AI agent:")
 print("You run: python agent.py\n")
-time.sleep(1)
+pause(1)
 
 print("=" * 70)
 print("AI Agent powered by Claude with Vision")
@@ -137,10 +152,10 @@ print("\nInteractive mode - type 'quit' to exit")
 print("To analyze an image, type: image:/path/to/image.jpg What do you see?")
 print("=" * 70)
 
-time.sleep(1)
+pause(1)
 
 print("\nYou: Who is in ./photos/family_reunion.jpg?")
-time.sleep(1)
+pause(1)
 
 print("\n" + "=" * 60)
 print("User: Who is in ./photos/family_reunion.jpg?")
@@ -151,7 +166,7 @@ print("  Using tool: identify_person")
 print('  Input: {')
 print('    "image_path": "./photos/family_reunion.jpg"')
 print('  }')
-time.sleep(2)
+pause(2)
 
 print("  Result: Identification results (comparing against 3 people in database):")
 print()
@@ -167,7 +182,7 @@ print("  PERSON 3:")
 print("  - Match: Unknown")
 print()
 
-time.sleep(2)
+pause(2)
 
 print("\nTurn 2:")
 print("Stop reason: end_turn")
@@ -176,7 +191,7 @@ print("Alice (high confidence) and Bob (high confidence) from your database.")
 print("There's also one person who isn't in your database yet.")
 print()
 
-time.sleep(2)
+pause(2)
 
 print_header("Summary")
 
@@ -95,10 +95,11 @@ print("=" * 70)
 print("""
 You can also use it in your own Python scripts:
 
+    import asyncio
     from agent import run_agent
 
-    # Identify people in a photo
-    result = run_agent("Who is in the photo at ./my_photo.jpg?")
+    # Identify people in a photo (run_agent is a coroutine)
+    result = asyncio.run(run_agent("Who is in the photo at ./my_photo.jpg?"))
     print(result)
 
     # The agent autonomously decides to use identify_person tool
@@ -117,16 +118,16 @@ Scenario: Organizing photos from a family reunion
     to delete your data anytime."
 
 2. Build database
-   python face_identification.py
+   python face_identification.py  (or add_people_bulk() to add everyone at once)
    - Add Mom (./mom_ref.jpg)
    - Add Dad (./dad_ref.jpg)
    - Add Sister (./sister_ref.jpg)
    - Add Brother (./brother_ref.jpg)
    - Add Grandma (./grandma_ref.jpg)
 
-3. Process reunion photos
-   for photo in reunion_photos:
-       result = identify_people(photo)
+3. Process reunion photos (all at once - see the batch example below)
+   results = asyncio.run(run_agent_many([f"Who is in {p}?" for p in reunion_photos]))
+   for photo, result in zip(reunion_photos, results):
        tag_photo_with_names(photo, result)
 
 4. Result: All your reunion photos are now organized by who's in them!
@@ -139,23 +140,32 @@ print("""
 Here's a script to identify people in multiple photos:
 
 ```python
-from agent import run_agent
+from agent import run_agent_many
+import asyncio
 import os
 
 # Directory containing photos to process
 photo_dir = "./my_photos"
 
-for filename in os.listdir(photo_dir):
-    if filename.endswith(('.jpg', '.png', '.jpeg')):
-        photo_path = os.path.join(photo_dir, filename)
-
-        print(f"\\nProcessing: {filename}")
-        result = run_agent(f"Who is in {photo_path}?")
-        print(result)
-        print("-" * 60)
+photos = [
+    os.path.join(photo_dir, filename)
+    for filename in sorted(os.listdir(photo_dir))
+    if filename.lower().endswith(('.jpg', '.png', '.jpeg', '.heic'))
+]
+
+# Every photo is its own conversation; they run concurrently (up to
+# CLAUDE_CONCURRENCY Claude calls at a time) and print in order. prefetch
+# reads the photos in the background while the first API calls are in flight.
+results = asyncio.run(run_agent_many([f"Who is in {photo}?" for photo in photos],
+                                     prefetch=photos))
+
+for photo, result in zip(photos, results):
+    print(f"\n{os.path.basename(photo)}: {result}")
+    print("-" * 60)
 ```
 
-This will go through all photos and identify people in each one.
+This identifies the people in every photo, processing the photos concurrently
+instead of one API round-trip after another.
 """)
 
 print("\n" + "=" * 70)
@@ -212,11 +222,13 @@ Using the agent:    python agent.py
 """)
 
 # Check if database exists
-if os.path.exists("face_database.json"):
-    import json
-    with open("face_database.json") as f:
-        db = json.load(f)
-    print(f"\n✅ Database found with {len(db.get('people', []))} people")
+if os.path.exists("face.db"):
+    import sqlite3
+    with sqlite3.connect("face.db") as conn:
+        count = conn.execute("SELECT COUNT(*) FROM people").fetchone()[0]
+    print(f"\n✅ Database found with {count} people")
+elif os.path.exists("face_database.json"):
+    print("\n✅ Database found (face_database.json, imported into face.db on first use)")
 else:
     print("\n⚠️  No database found yet. Run: python face_identification.py")
 
@@ -4,7 +4,8 @@ Quick examples of people recognition capabilities.
 Replace the image paths with your own images to test.
 """
 
-from agent import run_agent
+import asyncio
+from agent import run_agent, run_agent_many
 
 print("=" * 70)
 print("People Recognition Examples")
@@ -20,7 +21,7 @@ print("-" * 70)
 print("Question: 'How many people are in this image?'")
 print("-" * 70)
 # Uncomment and add your image path:
-# result = run_agent("How many people are in the image at ./your_image.jpg?")
+# result = asyncio.run(run_agent("How many people are in the image at ./your_image.jpg?"))
 # print(result)
 print("(Add your image path in the code to test)")
 
@@ -30,7 +31,7 @@ print("-" * 70)
 print("Question: 'What are the people doing?'")
 print("-" * 70)
 # Uncomment and add your image path:
-# result = run_agent("What are the people doing in ./your_image.jpg?")
+# result = asyncio.run(run_agent("What are the people doing in ./your_image.jpg?"))
 # print(result)
 print("(Add your image path in the code to test)")
 
@@ -40,7 +41,7 @@ print("-" * 70)
 print("Question: 'What emotions do you see in the faces?'")
 print("-" * 70)
 # Uncomment and add your image path:
-# result = run_agent("What facial expressions and emotions do you see in ./your_image.jpg?")
+# result = asyncio.run(run_agent("What facial expressions and emotions do you see in ./your_image.jpg?"))
 # print(result)
 print("(Add your image path in the code to test)")
 
@@ -50,7 +51,7 @@ print("-" * 70)
 print("Question: 'Describe what the people are wearing'")
 print("-" * 70)
 # Uncomment and add your image path:
-# result = run_agent("Describe the clothing and appearance of people in ./your_image.jpg")
+# result = asyncio.run(run_agent("Describe the clothing and appearance of people in ./your_image.jpg"))
 # print(result)
 print("(Add your image path in the code to test)")
 
@@ -60,7 +61,7 @@ print("-" * 70)
 print("Question: 'What's the group dynamic and social context?'")
 print("-" * 70)
 # Uncomment and add your image path:
-# result = run_agent("Analyze the group dynamics and interactions in ./your_image.jpg")
+# result = asyncio.run(run_agent("Analyze the group dynamics and interactions in ./your_image.jpg"))
 # print(result)
 print("(Add your image path in the code to test)")
 
@@ -70,7 +71,7 @@ print("-" * 70)
 print("Question: 'Give me a detailed description of each person'")
 print("-" * 70)
 # Uncomment and add your image path:
-# result = run_agent("Provide a detailed analysis of each person in ./your_image.jpg")
+# result = asyncio.run(run_agent("Provide a detailed analysis of each person in ./your_image.jpg"))
 # print(result)
 print("(Add your image path in the code to test)")
 
@@ -80,10 +81,25 @@ print("-" * 70)
 print("Question: 'Are the people indoors or outdoors?'")
 print("-" * 70)
 # Uncomment and add your image path:
-# result = run_agent("Are the people in ./your_image.jpg indoors or outdoors? Describe the setting.")
+# result = asyncio.run(run_agent("Are the people in ./your_image.jpg indoors or outdoors? Describe the setting."))
 # print(result)
 print("(Add your image path in the code to test)")
 
+# Example 8: Several questions at once
+print("\n8. SEVERAL QUESTIONS AT ONCE")
+print("-" * 70)
+print("Questions: count, activities, and setting for the same image, run concurrently")
+print("-" * 70)
+# Uncomment and add your image path:
+# results = asyncio.run(run_agent_many([
+#     "How many people are in the image at ./your_image.jpg?",
+#     "What are the people doing in ./your_image.jpg?",
+#     "Are the people in ./your_image.jpg indoors or outdoors?",
+# ]))
+# for result in results:
+#     print(result)
+print("(Add your image path in the code to test)")
+
 print("\n" + "=" * 70)
 print("How It Works")
 print("=" * 70)
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Local Face Embeddings
+
+Detects faces and computes ArcFace embeddings on-device with InsightFace, so
+identification compares vectors locally instead of asking Claude to compare
+prose descriptions of every person in the database.
+
+Optional dependencies (face identification falls back to Claude descriptions
+when they are not installed):
+    pip install insightface onnxruntime opencv-python-headless numpy
+
+Configure via environment variables:
+- FACE_MODEL: InsightFace model pack (default: buffalo_l)
+- FACE_EMBEDDING_CACHE: SQLite file caching reference embeddings by image
+  content hash (default: face_embedding_cache.db)
+"""
+
+import os
+import hashlib
+import sqlite3
+import functools
+import threading
+import importlib.util
+
+FACE_MODEL = os.environ.get("FACE_MODEL", "buffalo_l")
+EMBEDDING_DIM = 512
+
+EMBEDDING_CACHE_FILE = os.environ.get("FACE_EMBEDDING_CACHE", "face_embedding_cache.db")
+_cache_lock = threading.Lock()
+
+# Minimum cosine similarity between normalized ArcFace embeddings for each
+# confidence level; anything below "low" is not treated as a match
+CONFIDENCE_THRESHOLDS = {"high": 0.65, "medium": 0.5, "low": 0.35}
+
+
+def embeddings_available() -> bool:
+    """
+    Check whether the local embedding model's packages are installed.
+
+    Only looks the packages up, so this is cheap to call before deciding which
+    identification path to take.
+    """
+    return all(
+        importlib.util.find_spec(module) is not None
+        for module in ("insightface", "onnxruntime", "cv2", "numpy")
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def get_face_app():
+    """
+    Load the InsightFace detector + recognizer once (downloads the model pack on first use).
+
+    Returns:
+        Prepared insightface.app.FaceAnalysis instance
+    """
+    from insightface.app import FaceAnalysis
+
+    app = FaceAnalysis(name=FACE_MODEL, providers=["CPUExecutionProvider"])
+    app.prepare(ctx_id=-1, det_size=(640, 640))
+    return app
+
+
+def normalize(vectors):
+    """
+    Scale embeddings to unit length, so cosine similarity is a plain dot product.
+
+    Args:
+        vectors: (dim,) embedding or (N, dim) matrix of embeddings
+
+    Returns:
+        float32 array of the same shape, each embedding L2-normalized
+    """
+    import numpy as np
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / (np.linalg.norm(vectors, axis=-1, keepdims=True) + 1e-12)
+
+
+def _read_bgr(image_path: str):
+    """
+    Decode an image into the BGR array InsightFace expects.
+
+    OpenCV handles the common formats (and applies EXIF orientation); HEIC
+    photos are decoded with pillow_heif instead.
+    """
+    import cv2
+    import numpy as np
+
+    img = cv2.imread(image_path)
+    if img is None:
+        import pillow_heif
+
+        heif = pillow_heif.open_heif(image_path, convert_hdr_to_8bit=True)
+        rgb = np.asarray(heif.to_pillow().convert("RGB"))
+        img = np.ascontiguousarray(rgb[:, :, ::-1])
+    return img
+
+
+def detect_faces(image_path: str) -> list:
+    """
+    Detect faces in an image, largest first.
+
+    Args:
+        image_path: Path to the image
+
+    Returns:
+        List of InsightFace Face objects (bbox, det_score, embedding, ...)
+    """
+    return _detect(_read_bgr(image_path))
+
+
+def _detect(img) -> list:
+    """Detect faces in a decoded BGR image, largest first."""
+    faces = get_face_app().get(img)
+    return sorted(faces, key=lambda f: (f.bbox[2] - f.bbox[0]) * (f.bbox[3] - f.bbox[1]),
+                  reverse=True)
+
+
+def _aligned_crop(img, face) -> bytes:
+    """JPEG of the face, aligned on its landmarks to the recognizer's 112x112 input."""
+    import cv2
+    from insightface.utils import face_align
+
+    crop = face_align.norm_crop(img, landmark=face.kps)
+    return cv2.imencode(".jpg", crop)[1].tobytes()
+
+
+@functools.lru_cache(maxsize=1)
+def _embedding_cache() -> sqlite3.Connection:
+    """Open the reference embedding cache, creating its table on first use."""
+    conn = sqlite3.connect(EMBEDDING_CACHE_FILE, check_same_thread=False)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS embeddings "
+        "(hash TEXT PRIMARY KEY, model_id TEXT NOT NULL, vec BLOB NOT NULL, crop BLOB)"
+    )
+    if "crop" not in {column[1] for column in conn.execute("PRAGMA table_info(embeddings)")}:
+        # Caches created before face crops were stored
+        conn.execute("ALTER TABLE embeddings ADD COLUMN crop BLOB")
+    return conn
+
+
+def _file_digest(image_path: str) -> str:
+    """BLAKE2b digest of a file's contents, used as the embedding cache key."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(image_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def reference_face(image_path: str):
+    """
+    Detect the main (largest) face in a reference photo locally.
+
+    Results are cached by the image's content hash, so re-adding the same
+    photo (under any path) skips the model. Entries computed with a different
+    FACE_MODEL are ignored and overwritten.
+
+    Args:
+        image_path: Path to a clear photo of one person's face
+
+    Returns:
+        Tuple of (normalized float32 embedding of shape (EMBEDDING_DIM,),
+        JPEG bytes of the aligned face crop)
+
+    Raises:
+        ValueError: If no face is detected
+    """
+    import numpy as np
+
+    key = _file_digest(image_path)
+    conn = _embedding_cache()
+    with _cache_lock:
+        row = conn.execute(
+            "SELECT vec, crop FROM embeddings WHERE hash = ? AND model_id = ?", (key, FACE_MODEL)
+        ).fetchone()
+    if row is not None and row[1] is not None:
+        return np.frombuffer(row[0], dtype=np.float32).copy(), row[1]
+
+    img = _read_bgr(image_path)
+    faces = _detect(img)
+    if not faces:
+        raise ValueError(f"No face detected in {image_path}")
+    # Normalized once here, so stored embeddings never need it at query time
+    embedding = normalize(faces[0].embedding)
+    crop = _aligned_crop(img, faces[0])
+
+    with _cache_lock, conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO embeddings (hash, model_id, vec, crop) VALUES (?, ?, ?, ?)",
+            (key, FACE_MODEL, embedding.tobytes(), crop),
+        )
+    return embedding, crop
+
+
+def reference_embedding(image_path: str):
+    """
+    Compute the embedding of the main (largest) face in a reference photo.
+
+    Args:
+        image_path: Path to a clear photo of one person's face
+
+    Returns:
+        Normalized float32 embedding of shape (EMBEDDING_DIM,)
+
+    Raises:
+        ValueError: If no face is detected
+    """
+    return reference_face(image_path)[0]
+
+
+def query_embeddings(image_path: str):
+    """
+    Compute embeddings for every face in a photo.
+
+    Results (including finding no faces) are cached per file version, so
+    asking about the same photo again skips the model.
+
+    Args:
+        image_path: Path to the image
+
+    Returns:
+        Tuple of (faces, normalized float32 matrix of shape (num_faces, EMBEDDING_DIM))
+    """
+    st = os.stat(image_path)
+    return _query_embeddings(os.path.abspath(image_path), st.st_mtime_ns, st.st_size)
+
+
+@functools.lru_cache(maxsize=64)
+def _query_embeddings(image_path: str, mtime_ns: int, size: int):
+    """query_embeddings, keyed on the file's mtime and size."""
+    import numpy as np
+
+    faces = detect_faces(image_path)
+    matrix = np.asarray([face.embedding for face in faces], dtype=np.float32)
+    return faces, normalize(matrix.reshape(len(faces), EMBEDDING_DIM))
+
+
+def face_crops(image_path: str, faces: list) -> list:
+    """
+    Aligned JPEG crops of faces found in a photo by query_embeddings.
+
+    Args:
+        image_path: Path to the image the faces were detected in
+        faces: Face objects from query_embeddings
+
+    Returns:
+        List of JPEG bytes, one per face
+    """
+    img = _read_bgr(image_path)
+    return [_aligned_crop(img, face) for face in faces]
+
+
+def has_faces(image_path: str) -> bool:
+    """Check whether the local detector finds any face in a photo."""
+    return len(query_embeddings(image_path)[0]) > 0
+
+
+def confidence_label(score: float) -> str:
+    """
+    Map a cosine similarity to "high", "medium", "low", or None for no match.
+    """
+    for label in ("high", "medium", "low"):
+        if score >= CONFIDENCE_THRESHOLDS[label]:
+            return label
+    return None
@@ -15,64 +15,244 @@ How it works:
 1. Build a reference database with photos of known people (with consent)
 2. System compares faces in new photos against the reference database
 3. Identifies matches and helps organize your photos
+
+With the optional local face model installed (see face_embeddings.py), each
+reference photo is stored as a face embedding and identification is a vector
+comparison on your machine. Without it, Claude writes a description of each
+reference face and compares photos against those descriptions.
 """
 
 import os
-import json
+import sqlite3
+import functools
+import contextlib
+import dataclasses
+import orjson
+import pybase64
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import List, Optional, Tuple
 from claude_client import create_claude_client, load_and_encode_image, get_model_name
+import face_embeddings
+from face_index import FaceIndex
 
-# Initialize Claude client (supports Anthropic API, Vertex AI, and Gemini)
-client = create_claude_client()
 MODEL_NAME = get_model_name()
 
 # Database file for storing known people
-DATABASE_FILE = "face_database.json"
+DATABASE_FILE = "face.db"
+
+# Earlier versions kept the database as JSON, with embeddings in a .npy sidecar;
+# it is imported into DATABASE_FILE the first time the database is opened
+LEGACY_DATABASE_FILE = "face_database.json"
+LEGACY_EMBEDDINGS_FILE = "face_database.npy"
+
+# Saved vector index over the database's embeddings (rebuilt when the database is newer)
+FACE_INDEX_FILE = "face.index"
+
+# Contiguous (N, EMBEDDING_DIM) float32 copy of the stored embeddings, memory-mapped
+# for search instead of being reassembled from rows (rebuilt when the database is newer)
+VECTORS_FILE = "face_vectors.npy"
+
+# Names aren't unique keys, so a person can later have more than one reference row
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS people (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    vec BLOB,
+    facial_description TEXT,
+    notes TEXT,
+    ref_path TEXT,
+    added_date TEXT,
+    face_crop BLOB
+);
+CREATE INDEX IF NOT EXISTS people_name ON people (name COLLATE NOCASE);
+"""
 
+_COLUMNS = "name, vec, facial_description, notes, ref_path, added_date"
+# Face crops are only written here; load_database leaves them on disk
+_INSERT = f"INSERT INTO people ({_COLUMNS}, face_crop) VALUES (?, ?, ?, ?, ?, ?, ?)"
 
-def load_database():
-    """Load the face database from disk."""
-    if os.path.exists(DATABASE_FILE):
-        with open(DATABASE_FILE, 'r') as f:
-            return json.load(f)
-    return {"people": []}
 
+def _connect() -> sqlite3.Connection:
+    """Open the database, creating it (and importing a legacy JSON database) if needed."""
+    is_new = not os.path.exists(DATABASE_FILE)
+    conn = sqlite3.connect(DATABASE_FILE)
+    conn.executescript(_SCHEMA)
+    if "face_crop" not in {column[1] for column in conn.execute("PRAGMA table_info(people)")}:
+        # Databases created before face crops were stored
+        conn.execute("ALTER TABLE people ADD COLUMN face_crop BLOB")
+    if is_new and os.path.exists(LEGACY_DATABASE_FILE):
+        _import_legacy_database(conn)
+    return conn
+
+
+def _import_legacy_database(conn: sqlite3.Connection):
+    """Copy the people from face_database.json (and its embeddings) into SQLite."""
+    with open(LEGACY_DATABASE_FILE, 'rb') as f:
+        people = orjson.loads(f.read()).get("people", [])
+
+    matrix = None
+    if any("embedding_row" in p for p in people):
+        import numpy as np
 
-def save_database(db):
-    """Save the face database to disk."""
-    with open(DATABASE_FILE, 'w') as f:
-        json.dump(db, f, indent=2)
+        matrix = np.load(LEGACY_EMBEDDINGS_FILE)
+    for person in people:
+        if "embedding_row" in person:
+            person["embedding"] = matrix[person["embedding_row"]]
 
+    with conn:
+        conn.executemany(_INSERT, [_row(p) for p in people])
+    print(f"Imported {len(people)} people from {LEGACY_DATABASE_FILE} into {DATABASE_FILE}")
 
-def add_person_to_database(name: str, reference_image_path: str, notes: str = ""):
+
+def _row(person: dict) -> tuple:
+    """Column values for a person entry."""
+    embedding = person.get("embedding")
+    if embedding is not None:
+        # Stored unit-length (a no-op for new embeddings), so every scan is a plain dot product
+        embedding = face_embeddings.normalize(embedding).tobytes()
+    return (person["name"], embedding, person.get("facial_description"),
+            person.get("notes", ""), person.get("reference_image"), person.get("added_date"),
+            person.get("face_crop"))
+
+
+def _load_vectors(conn: sqlite3.Connection, count: int, mtime: float):
     """
-    Add a person to the reference database.
+    Memory-map VECTORS_FILE, first rewriting it from the database if it is stale.
 
-    Args:
-        name: Person's name
-        reference_image_path: Path to a clear photo of their face
-        notes: Optional notes (relationship, context, etc.)
+    Returns:
+        Read-only float32 matrix of shape (count, EMBEDDING_DIM), one row per
+        person with an embedding, in id order
     """
-    db = load_database()
+    import numpy as np
 
-    # Check if person already exists
-    for person in db["people"]:
-        if person["name"].lower() == name.lower():
-            print(f"⚠️  {name} already exists in database. Use update instead.")
-            return False
+    if os.path.exists(VECTORS_FILE) and os.path.getmtime(VECTORS_FILE) >= mtime:
+        matrix = np.load(VECTORS_FILE, mmap_mode='r')
+        if matrix.shape == (count, face_embeddings.EMBEDDING_DIM):
+            return matrix
 
-    # Verify image exists
-    if not os.path.exists(reference_image_path):
-        print(f"❌ Error: Image not found at {reference_image_path}")
-        return False
+    vecs = conn.execute("SELECT vec FROM people WHERE vec IS NOT NULL ORDER BY id").fetchall()
+    matrix = np.frombuffer(b"".join(vec for (vec,) in vecs), dtype=np.float32)
+    matrix = matrix.reshape(len(vecs), face_embeddings.EMBEDDING_DIM)
+    tmp_path = VECTORS_FILE + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, matrix)
+    os.replace(tmp_path, VECTORS_FILE)
+    return np.load(VECTORS_FILE, mmap_mode='r')
 
-    # Get facial features description for reference
-    print(f"Analyzing reference image for {name}...")
+
+@dataclasses.dataclass(frozen=True)
+class FaceDatabase:
+    """
+    The face database in column-oriented form.
+
+    Position i is the same person in every per-person field. Embeddings live
+    in one contiguous matrix instead of per person: vecs[vec_rows[i]] is
+    person i's embedding, and vec_rows[i] is -1 when they don't have one.
+    """
+    ids: Tuple[int, ...] = ()
+    names: Tuple[str, ...] = ()
+    paths: Tuple[str, ...] = ()
+    notes: Tuple[str, ...] = ()
+    descriptions: Tuple[Optional[str], ...] = ()
+    added_dates: Tuple[str, ...] = ()
+    vec_rows: Tuple[int, ...] = ()
+    # Read-only (N, EMBEDDING_DIM) float32 matrix, memory-mapped; None without embeddings
+    vecs: object = None
+
+    def __len__(self):
+        return len(self.names)
+
+    @functools.cached_property
+    def embedded(self) -> Tuple[int, ...]:
+        """Positions of the people with an embedding, in vecs row order."""
+        return tuple(i for i, row in enumerate(self.vec_rows) if row >= 0)
+
+    def index_of(self, name: str) -> Optional[int]:
+        """Position of the first person with this name (case-insensitive), or None."""
+        name = name.lower()
+        return next((i for i, n in enumerate(self.names) if n.lower() == name), None)
+
+    def embedding(self, i: int):
+        """Person i's embedding, or None."""
+        return self.vecs[self.vec_rows[i]] if self.vec_rows[i] >= 0 else None
+
+
+@functools.lru_cache(maxsize=1)
+def _read_database(mtime_ns: int, size: int) -> FaceDatabase:
+    """
+    Read every person from the database.
+
+    Keyed on the file's mtime and size, so it is only re-read after the
+    database changes. Embeddings aren't read from their rows: vecs is the
+    memory-mapped VECTORS_FILE, so only the pages actually used are ever
+    loaded.
+    """
+    with contextlib.closing(_connect()) as conn:
+        rows = conn.execute(
+            "SELECT id, name, ref_path, notes, facial_description, added_date, vec IS NOT NULL "
+            "FROM people ORDER BY id"
+        ).fetchall()
+        if not rows:
+            return FaceDatabase()
+        ids, names, paths, notes, descriptions, added_dates, has_vec = zip(*rows)
+        count = sum(has_vec)
+        vecs = _load_vectors(conn, count, mtime_ns / 1e9) if count else None
+
+    vec_rows, row = [], 0
+    for flag in has_vec:
+        vec_rows.append(row if flag else -1)
+        row += bool(flag)
+
+    return FaceDatabase(ids=ids, names=names, paths=paths, notes=notes,
+                        descriptions=descriptions, added_dates=added_dates,
+                        vec_rows=tuple(vec_rows), vecs=vecs)
+
+
+def _database_key() -> Tuple[int, int]:
+    """
+    (st_mtime_ns, st_size) of DATABASE_FILE.
+
+    Every cache derived from the database is keyed on this, so they are all
+    invalidated by the same writes.
+    """
+    st = os.stat(DATABASE_FILE)
+    return st.st_mtime_ns, st.st_size
+
+
+def load_database() -> FaceDatabase:
+    """Load the face database from disk."""
+    if not os.path.exists(DATABASE_FILE):
+        if not os.path.exists(LEGACY_DATABASE_FILE):
+            return FaceDatabase()
+        _connect().close()
+    return _read_database(*_database_key())
+
+
+def _insert_people(people: List[dict]):
+    """Append person entries to the database in one transaction."""
+    with contextlib.closing(_connect()) as conn, conn:
+        conn.executemany(_INSERT, [_row(p) for p in people])
+
+
+def _delete_person(name: str) -> int:
+    """Delete everyone with this name (case-insensitive); returns the number of rows removed."""
+    with contextlib.closing(_connect()) as conn, conn:
+        return conn.execute("DELETE FROM people WHERE name = ? COLLATE NOCASE", (name,)).rowcount
+
+
+def _client():
+    """Claude client (supports Anthropic API, Vertex AI, and Gemini), created on first use."""
+    return create_claude_client()
+
+
+def _describe_face(reference_image_path: str) -> str:
+    """Ask Claude for a facial description of a reference image."""
     # Load and encode image (handles HEIC conversion)
     image_data, media_type = load_and_encode_image(reference_image_path)
 
     # Get detailed facial description
-    message = client.messages.create(
+    message = _client().messages.create(
         model=MODEL_NAME,
         max_tokens=1024,
         messages=[{
@@ -104,64 +284,258 @@ Be specific and detailed to enable future identification."""
         }]
     )
 
-    description = ""
-    for block in message.content:
-        if hasattr(block, 'text'):
-            description += block.text
+    return "".join([block.text for block in message.content if block.type == "text"])
 
-    # Add to database
-    person_entry = {
-        "name": name,
-        "reference_image": reference_image_path,
-        "facial_description": description,
-        "notes": notes,
-        "added_date": str(Path(reference_image_path).stat().st_mtime)
-    }
 
-    db["people"].append(person_entry)
-    save_database(db)
+@functools.lru_cache(maxsize=1)
+def _load_embeddings(mtime_ns: int, size: int):
+    """
+    Load the vector index over the database's reference embeddings.
+
+    Keyed on the database file's mtime and size (see _database_key), so the embedding matrix and index are
+    loaded (or rebuilt and saved to VECTORS_FILE / FACE_INDEX_FILE) only after
+    the database changes. Index id j is the person at db.embedded[j].
+
+    Returns:
+        Tuple of (FaceDatabase, FaceIndex)
+    """
+    import numpy as np
+
+    db = _read_database(mtime_ns, size)
+    if db.vecs is None:
+        empty = np.empty((0, face_embeddings.EMBEDDING_DIM), dtype=np.float32)
+        return db, FaceIndex.build(empty)
+    return db, FaceIndex.load_or_build(FACE_INDEX_FILE, db.vecs, mtime_ns / 1e9)
+
+
+def _face_crops(row_ids: List[int]) -> dict:
+    """Stored face crops (JPEG bytes) for database rows, keyed by row id."""
+    placeholders = ", ".join("?" * len(row_ids))
+    with contextlib.closing(_connect()) as conn:
+        return dict(conn.execute(
+            f"SELECT id, face_crop FROM people WHERE id IN ({placeholders}) AND face_crop IS NOT NULL",
+            row_ids,
+        ).fetchall())
+
+
+def _verify_with_claude(query_crop: bytes, candidates: List[Tuple[str, bytes]]) -> str:
+    """
+    Ask Claude which, if any, of the candidate reference faces shows the same person.
+
+    Only the aligned face crops are sent: the face from the photo, then each candidate's.
+    """
+    content = [{"type": "text", "text": "Face from the photo:"},
+               {"type": "image", "source": {"type": "base64", "media_type": "image/jpeg",
+                                            "data": pybase64.b64encode_as_string(query_crop)}}]
+    for name, crop in candidates:
+        content.append({"type": "text", "text": f"Reference face of {name}:"})
+        content.append({"type": "image", "source": {"type": "base64", "media_type": "image/jpeg",
+                                                    "data": pybase64.b64encode_as_string(crop)}})
+    content.append({"type": "text", "text": (
+        "These are photos of the user's consenting family and friends. Is the face from the photo "
+        "the same person as one of the reference faces? Answer with that person's name or "
+        "\"None\", followed by one sentence of reasoning.")})
+
+    message = _client().messages.create(
+        model=MODEL_NAME,
+        max_tokens=256,
+        messages=[{"role": "user", "content": content}]
+    )
+    return "".join([block.text for block in message.content if block.type == "text"]).strip()
+
+
+def _identify_by_embedding(image_path: str, confidence_threshold: str, top_k: int = 3,
+                           verify: bool = False) -> str:
+    """
+    Match every face in an image against the stored reference embeddings.
+
+    Matching is two-stage: the index shortlists candidates (approximately, for
+    large databases) and they are re-scored exactly. With verify, faces whose
+    best match is below high confidence also go to Claude, which compares the
+    face crop against the top candidates' stored crops.
+
+    Args:
+        image_path: Path to the image to analyze
+        confidence_threshold: Weakest confidence ("high", "medium", "low") accepted as a match
+        top_k: Number of candidates listed per face
+        verify: Double-check uncertain matches with Claude
+
+    Returns:
+        Identification results in the same layout as the Claude comparison
+    """
+    db, index = _load_embeddings(*_database_key())
+    names = [db.names[i] for i in db.embedded]
+    row_ids = [db.ids[i] for i in db.embedded]
+    faces, queries = face_embeddings.query_embeddings(image_path)
+    if not faces:
+        return "No faces detected in the image."
+
+    min_score = face_embeddings.CONFIDENCE_THRESHOLDS[confidence_threshold]
+    # Embeddings are L2-normalized, so inner-product scores are cosine similarities.
+    # FAISS pads missing results with id -1 (score -inf); those are skipped below
+    scores, ids = index.search(queries, min(top_k, len(names)))
+
+    uncertain = [i for i, face_scores in enumerate(scores)
+                 if verify and face_embeddings.confidence_label(float(face_scores[0])) != "high"]
+    checks = {}
+    if uncertain:
+        query_crops = face_embeddings.face_crops(image_path, [faces[i] for i in uncertain])
+        crops = _face_crops(sorted({row_ids[j] for i in uncertain for j in ids[i] if j >= 0}))
+        for i, query_crop in zip(uncertain, query_crops):
+            candidates = [(names[j], crops[row_ids[j]]) for j in ids[i] if j >= 0 and row_ids[j] in crops]
+            if candidates:
+                checks[i] = _verify_with_claude(query_crop, candidates)
+
+    sections = []
+    for i, (face_scores, ranked) in enumerate(zip(scores, ids), 1):
+        best = ranked[0]
+        label = face_embeddings.confidence_label(float(face_scores[0]))
+        matched = best >= 0 and label is not None and face_scores[0] >= min_score
+        left, top, right, bottom = (int(v) for v in faces[i - 1].bbox)
+        sections.append("\n".join([
+            f"PERSON {i} IN IMAGE:",
+            f"- Location: ({left}, {top}) to ({right}, {bottom})",
+            f"- Match: {names[best] if matched else 'Unknown'}",
+            f"- Confidence: {label.capitalize() if matched else 'N/A'}",
+            "- Candidates: " + ", ".join(f"{names[j]} ({score:.2f})"
+                                         for j, score in zip(ranked, face_scores) if j >= 0),
+        ] + ([f"- Claude check: {checks[i - 1]}"] if i - 1 in checks else [])))
+    return "\n\n".join(sections)
+
+
+def _analyze_one(reference_image_path: str, describe: bool = False) -> dict:
+    """
+    Compute the identification data stored for a reference photo.
+
+    With the local face model this is an embedding plus an aligned face crop,
+    and Claude is only asked for a description when describe is set. Without
+    it, Claude's description is the only option.
+
+    Returns:
+        Dict with "embedding" and "face_crop" and/or "facial_description"
+
+    Raises:
+        ValueError: If the local face model finds no face
+    """
+    features = {}
+    if face_embeddings.embeddings_available():
+        features["embedding"], features["face_crop"] = face_embeddings.reference_face(reference_image_path)
+        if not describe:
+            return features
+    features["facial_description"] = _describe_face(reference_image_path)
+    return features
+
+
+def add_person_to_database(name: str, reference_image_path: str, notes: str = "",
+                           describe: bool = False):
+    """
+    Add a person to the reference database.
+
+    Args:
+        name: Person's name
+        reference_image_path: Path to a clear photo of their face
+        notes: Optional notes (relationship, context, etc.)
+        describe: Also store a written description from Claude when using the local face model
+    """
+    db = load_database()
+
+    # Check if person already exists
+    if db.index_of(name) is not None:
+        print(f"⚠️  {name} already exists in database. Use update instead.")
+        return False
+
+    # Verify image exists
+    if not os.path.exists(reference_image_path):
+        print(f"❌ Error: Image not found at {reference_image_path}")
+        return False
+
+    print(f"Analyzing reference image for {name}...")
+    try:
+        features = _analyze_one(reference_image_path, describe)
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        return False
+
+    # Add to database
+    _insert_people([_person_entry(name, reference_image_path, notes, features)])
 
     print(f"✅ Added {name} to database!")
     print(f"   Reference image: {reference_image_path}")
     return True
 
 
-def identify_person_in_image(image_path: str, confidence_threshold: str = "medium"):
+def _person_entry(name: str, reference_image_path: str, notes: str, features: dict) -> dict:
+    """Build a database entry from a reference photo's analysis."""
+    return {
+        "name": name,
+        "reference_image": reference_image_path,
+        **features,
+        "notes": notes,
+        "added_date": str(Path(reference_image_path).stat().st_mtime),
+    }
+
+
+def add_people_bulk(entries: List[Tuple[str, str, str]], max_workers: int = 8,
+                    describe: bool = False) -> List[str]:
     """
-    Identify people in an image by comparing against the database.
+    Add several people to the reference database at once.
+
+    Reference photos are analyzed concurrently and everyone is inserted in
+    one transaction at the end, so bootstrapping a database costs about one analysis
+    round-trip instead of one per person.
 
     Args:
-        image_path: Path to the image to analyze
-        confidence_threshold: "high", "medium", or "low" - how strict to be with matches
+        entries: (name, reference_image_path, notes) tuples
+        max_workers: Maximum number of photos analyzed at the same time
+        describe: Also store written descriptions from Claude when using the local face model
 
     Returns:
-        List of identified people with confidence levels
+        Names of the people that were added
     """
-    db = load_database()
+    taken = {name.lower() for name in load_database().names}
 
-    if not db["people"]:
-        return {"error": "No people in database. Add reference images first."}
+    pending = []
+    for name, reference_image_path, notes in entries:
+        if name.lower() in taken:
+            print(f"⚠️  {name} already exists in database. Use update instead.")
+        elif not os.path.exists(reference_image_path):
+            print(f"❌ Error: Image not found at {reference_image_path}")
+        else:
+            taken.add(name.lower())
+            pending.append((name, reference_image_path, notes))
 
-    if not os.path.exists(image_path):
-        return {"error": f"Image not found at {image_path}"}
+    if not pending:
+        return []
 
-    # Read the target image (handles HEIC conversion)
-    target_image_data, target_media_type = load_and_encode_image(image_path)
+    if face_embeddings.embeddings_available():
+        # Load the model once up front instead of racing to load it in every worker
+        face_embeddings.get_face_app()
 
-    print(f"Analyzing image: {image_path}")
-    print(f"Comparing against {len(db['people'])} people in database...")
+    def analyze(entry):
+        try:
+            return _analyze_one(entry[1], describe)
+        except ValueError as e:
+            return e
 
-    # Build comparison prompt
-    people_descriptions = "\n\n".join([
-        f"Person {i+1} - {person['name']}:\n{person['facial_description']}"
-        for i, person in enumerate(db['people'])
-    ])
+    print(f"Analyzing {len(pending)} reference images...")
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(pending))) as pool:
+        results = list(pool.map(analyze, pending))
+
+    entries = []
+    for (name, reference_image_path, notes), features in zip(pending, results):
+        if isinstance(features, ValueError):
+            print(f"❌ Error adding {name}: {features}")
+            continue
+        entries.append(_person_entry(name, reference_image_path, notes, features))
 
-    prompt = f"""Compare the people in this image against these known individuals:
+    added = [entry["name"] for entry in entries]
+    if entries:
+        _insert_people(entries)
+        print(f"✅ Added {len(added)} people to database: {', '.join(added)}")
+    return added
 
-{people_descriptions}
 
-For each person visible in the image:
+IDENTIFICATION_INSTRUCTIONS = """For each person visible in the image:
 1. Describe their appearance
 2. Determine if they match any of the known individuals
 3. Provide confidence level (high/medium/low) for any matches
@@ -179,13 +553,107 @@ PERSON 2 IN IMAGE:
 
 Be thorough and careful with identification. Only claim high confidence if features clearly match."""
 
+
+# Prompt caching only applies to prefixes of at least this many tokens
+MIN_CACHEABLE_TOKENS = 1024
+
+
+@functools.lru_cache(maxsize=1)
+def _reference_prompt(mtime_ns: int, size: int) -> str:
+    """
+    Describe the database's known individuals for Claude.
+
+    Keyed on the database file's mtime and size (see _database_key), so the
+    text is identical between queries until the database changes.
+    """
+    db = _read_database(mtime_ns, size)
+    described = [(name, description) for name, description in zip(db.names, db.descriptions) if description]
+    people_descriptions = "\n\n".join([
+        f"Person {i+1} - {name}:\n{description}"
+        for i, (name, description) in enumerate(described)
+    ])
+    return f"""Compare the people in the image that follows against these known individuals:
+
+{people_descriptions}"""
+
+
+def _reference_block(reference_prompt: str) -> dict:
+    """
+    Text block for the reference prompt, sent ahead of the image.
+
+    It is marked for prompt caching only when it is long enough to be cached
+    (estimated at 4 characters per token); a small database's descriptions
+    fall below the minimum, where the marker would have no effect.
+    """
+    block = {"type": "text", "text": reference_prompt}
+    if len(reference_prompt) // 4 >= MIN_CACHEABLE_TOKENS:
+        block["cache_control"] = {"type": "ephemeral"}
+    return block
+
+
+def identification_blocks() -> Tuple[dict, dict]:
+    """
+    Text blocks asking Claude to identify people against the database.
+
+    The reference block only changes when the database does, so it goes ahead
+    of the image (cached once it is large enough); the instructions follow
+    the image.
+
+    Returns:
+        Tuple of (reference block, instructions block)
+    """
+    return (_reference_block(_reference_prompt(*_database_key())),
+            {"type": "text", "text": IDENTIFICATION_INSTRUCTIONS})
+
+
+def identify_person_in_image(image_path: str, confidence_threshold: str = "medium",
+                             verify: bool = False):
+    """
+    Identify people in an image by comparing against the database.
+
+    Args:
+        image_path: Path to the image to analyze
+        confidence_threshold: "high", "medium", or "low" - how strict to be with matches
+        verify: With the local face model, have Claude double-check matches below
+            high confidence by comparing face crops
+
+    Returns:
+        List of identified people with confidence levels
+    """
+    db = load_database()
+
+    if not len(db):
+        return {"error": "No people in database. Add reference images first."}
+
+    if not os.path.exists(image_path):
+        return {"error": f"Image not found at {image_path}"}
+
+    print(f"Analyzing image: {image_path}")
+    print(f"Comparing against {len(db)} people in database...")
+
+    if face_embeddings.embeddings_available() and db.embedded:
+        return _identify_by_embedding(image_path, confidence_threshold, verify=verify)
+
+    if not any(db.descriptions):
+        return {"error": "The database only has face embeddings; install the local face model to use it "
+                         "(pip install insightface onnxruntime opencv-python-headless numpy)."}
+
+    # With the local detector available, don't ask Claude about a photo without faces
+    if face_embeddings.embeddings_available() and not face_embeddings.has_faces(image_path):
+        return "No faces detected in the image."
+
+    # Read the target image (handles HEIC conversion)
+    target_image_data, target_media_type = load_and_encode_image(image_path)
+
     # Call Claude to compare
-    message = client.messages.create(
+    reference, instructions = identification_blocks()
+    message = _client().messages.create(
         model=MODEL_NAME,
         max_tokens=2048,
         messages=[{
             "role": "user",
             "content": [
+                reference,
                 {
                     "type": "image",
                     "source": {
@@ -194,53 +662,41 @@ Be thorough and careful with identification. Only claim high confidence if featu
                         "data": target_image_data
                     }
                 },
-                {
-                    "type": "text",
-                    "text": prompt
-                }
+                instructions
             ]
         }]
     )
 
-    result = ""
-    for block in message.content:
-        if hasattr(block, 'text'):
-            result += block.text
-
-    return result
+    return "".join([block.text for block in message.content if block.type == "text"])
 
 
 def list_database_people():
     """List all people in the database."""
     db = load_database()
 
-    if not db["people"]:
+    if not len(db):
         print("Database is empty. Add people using option 1.")
         return
 
-    print("\n" + "=" * 70)
-    print(f"Face Database - {len(db['people'])} people")
-    print("=" * 70)
-
-    for i, person in enumerate(db['people'], 1):
-        print(f"\n{i}. {person['name']}")
-        print(f"   Reference: {person['reference_image']}")
-        if person.get('notes'):
-            print(f"   Notes: {person['notes']}")
-        print(f"   Description: {person['facial_description'][:100]}...")
-
-    print("=" * 70)
+    # Build the whole listing and write it once, instead of one print per line
+    lines = ["", "=" * 70, f"Face Database - {len(db)} people", "=" * 70]
+    for i in range(len(db)):
+        lines.append(f"\n{i + 1}. {db.names[i]}")
+        lines.append(f"   Reference: {db.paths[i]}")
+        if db.notes[i]:
+            lines.append(f"   Notes: {db.notes[i]}")
+        if db.vec_rows[i] >= 0:
+            lines.append(f"   Face embedding: {db.vecs.shape[1]} dimensions")
+        if db.descriptions[i]:
+            lines.append(f"   Description: {db.descriptions[i][:100]}...")
+    lines.append("=" * 70)
+    print("\n".join(lines))
 
 
 def remove_person_from_database(name: str):
     """Remove a person from the database."""
-    db = load_database()
-
-    original_count = len(db["people"])
-    db["people"] = [p for p in db["people"] if p["name"].lower() != name.lower()]
-
-    if len(db["people"]) < original_count:
-        save_database(db)
+    # Loading first imports a legacy database and avoids creating an empty one
+    if len(load_database()) and _delete_person(name):
         print(f"✅ Removed {name} from database")
         return True
     else:
@@ -299,7 +755,11 @@ def main():
                 print("❌ Cannot add without consent")
                 continue
 
-            add_person_to_database(name, reference_image, notes)
+            describe = False
+            if face_embeddings.embeddings_available():
+                describe = input("Also save a written description from Claude? (yes/no) [no]: ").strip().lower() == 'yes'
+
+            add_person_to_database(name, reference_image, notes, describe)
 
         elif choice == "2":
             print("\n🔍 Identify People in Photo")
@@ -310,8 +770,12 @@ def main():
                 print(f"❌ Image not found at {image_path}")
                 continue
 
+            verify = False
+            if face_embeddings.embeddings_available():
+                verify = input("Double-check uncertain matches with Claude? (yes/no) [no]: ").strip().lower() == 'yes'
+
             print("\n⏳ Analyzing...")
-            result = identify_person_in_image(image_path)
+            result = identify_person_in_image(image_path, verify=verify)
 
             print("\n" + "=" * 70)
             print("IDENTIFICATION RESULTS")
@@ -334,7 +798,7 @@ def main():
         elif choice == "5":
             print(f"\n💾 Database saved at: {os.path.abspath(DATABASE_FILE)}")
             db = load_database()
-            print(f"Contains {len(db['people'])} people")
+            print(f"Contains {len(db)} people")
 
         elif choice == "6":
             print("\nGoodbye!")
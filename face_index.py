@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Face Embedding Index
+
+Nearest-neighbour search over reference face embeddings for face
+identification. Uses a FAISS inner-product index when faiss is installed
+(pip install faiss-cpu) and a NumPy matrix product otherwise; both return the
+same (scores, ids) results.
+
+Search is exact for small databases. Larger ones use an approximate index
+as a first stage: an HNSW graph (sub-linear search), then, for the largest,
+product quantization (FAISS IndexPQ), where each 512-float embedding is
+stored as 64 one-byte codes, 32x smaller than float32. The first stage only
+shortlists candidates; they are re-scored exactly against the stored
+embeddings, so the confidence thresholds stay valid.
+"""
+
+import os
+import importlib.util
+
+# Embeddings needed before an HNSW graph (HNSW_M links per node) beats a flat scan
+HNSW_MIN_VECTORS = 2048
+HNSW_M = 32
+HNSW_EF_SEARCH = 64
+
+# Product quantization: PQ_SUBVECTORS codes of PQ_BITS bits per embedding
+PQ_SUBVECTORS = 64
+PQ_BITS = 8
+# Embeddings needed before switching to PQ; FAISS wants ~39 training points
+# per centroid (2 ** PQ_BITS centroids), and smaller databases fit in memory as-is
+PQ_MIN_VECTORS = 39 * 2 ** PQ_BITS
+# Candidates shortlisted by an approximate index (at least RERANK_CANDIDATES,
+# or RERANK_FACTOR per requested result), then re-scored exactly
+RERANK_CANDIDATES = 20
+RERANK_FACTOR = 8
+
+
+def faiss_available() -> bool:
+    """Check whether FAISS is installed, without importing it."""
+    return importlib.util.find_spec("faiss") is not None
+
+
+def _configure(index):
+    """Apply search-time settings, which aren't stored with a saved index."""
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    return index
+
+
+class FaceIndex:
+    """
+    Inner-product index over L2-normalized embeddings, so scores are cosine similarities.
+    """
+
+    def __init__(self, matrix, index=None):
+        self.matrix = matrix
+        self.index = index
+
+    @classmethod
+    def build(cls, matrix):
+        """
+        Build an index over an (N, dim) float32 embedding matrix.
+
+        Uses an exact IndexFlatIP, an IndexHNSWFlat from HNSW_MIN_VECTORS
+        embeddings, or a trained IndexPQ from PQ_MIN_VECTORS.
+
+        Args:
+            matrix: Reference embeddings, one row per stored face
+
+        Returns:
+            FaceIndex instance
+        """
+        import numpy as np
+
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        if not faiss_available():
+            return cls(matrix)
+
+        import faiss
+
+        dim = matrix.shape[1]
+        if len(matrix) >= PQ_MIN_VECTORS and dim % PQ_SUBVECTORS == 0:
+            index = faiss.IndexPQ(dim, PQ_SUBVECTORS, PQ_BITS, faiss.METRIC_INNER_PRODUCT)
+            index.train(matrix)
+        elif len(matrix) >= HNSW_MIN_VECTORS:
+            index = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexFlatIP(dim)
+        index.add(matrix)
+        return cls(matrix, _configure(index))
+
+    @classmethod
+    def load_or_build(cls, path: str, matrix, source_mtime: float):
+        """
+        Load a saved FAISS index if it is newer than its source, otherwise rebuild and save it.
+
+        Args:
+            path: Index file path
+            matrix: Reference embeddings the index must cover
+            source_mtime: Modification time of the file the embeddings came from
+
+        Returns:
+            FaceIndex instance
+        """
+        if faiss_available() and os.path.exists(path) and os.path.getmtime(path) >= source_mtime:
+            import faiss
+
+            index = faiss.read_index(path)
+            if index.ntotal == len(matrix) and index.d == matrix.shape[1]:
+                return cls(matrix, _configure(index))
+
+        built = cls.build(matrix)
+        if built.index is not None:
+            import faiss
+
+            faiss.write_index(built.index, path)
+        return built
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def search(self, queries, k: int):
+        """
+        Find the k most similar stored embeddings for each query.
+
+        Args:
+            queries: (M, dim) float32 matrix of L2-normalized query embeddings
+            k: Number of neighbours per query (capped at the index size)
+
+        Returns:
+            Tuple of (scores, ids), each (M, k), best match first
+        """
+        import numpy as np
+
+        k = min(k, len(self))
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        if self.index is not None:
+            import faiss
+
+            if isinstance(self.index, faiss.IndexFlatIP):
+                return self.index.search(queries, k)
+            # Retrieve a shortlist approximately, then re-score it exactly
+            shortlist = min(len(self), max(RERANK_CANDIDATES, k * RERANK_FACTOR))
+            _, ids = self.index.search(queries, shortlist)
+            scores = np.einsum("md,mkd->mk", queries, self.matrix[np.maximum(ids, 0)])
+            scores[ids < 0] = -np.inf  # FAISS pads with -1 when it finds fewer
+            order = np.argsort(-scores, axis=1)[:, :k]
+            return np.take_along_axis(scores, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+        scores = queries @ self.matrix.T
+        ids = np.argsort(-scores, axis=1)[:, :k]
+        return np.take_along_axis(scores, ids, axis=1), ids
@@ -4,12 +4,29 @@ Example script demonstrating image recognition capabilities.
 """
 
 import os
-from claude_client import create_claude_client, load_and_encode_image, get_model_name
+import sys
+import time
+import asyncio
+from typing import List, Tuple
+from claude_client import (create_claude_client, load_and_encode_image, load_and_encode_images,
+                           get_model_name, get_provider_name, upload_image, upload_image_async,
+                           close_async_clients, FILES_API_BETA)
 
 # Initialize Claude client (supports Anthropic API, Vertex AI, and Gemini)
 client = create_claude_client()
 MODEL_NAME = get_model_name()
 
+# The Message Batches API is only available on the Anthropic API
+BATCH_SUPPORTED = get_provider_name() == "anthropic"
+BATCH_POLL_SECONDS = 10
+
+# Requests analyze_images_concurrently keeps in flight at once
+MAX_CONCURRENT_REQUESTS = 5
+
+# Upload each image once through the Files API (CLAUDE_FILES_API=1, Anthropic API
+# only) and reference it by file_id instead of sending base64 with every request
+USE_FILES_API = os.environ.get("CLAUDE_FILES_API") == "1" and get_provider_name() == "anthropic"
+
 
 def analyze_image(image_path: str, prompt: str = "What's in this image?"):
     """
@@ -22,24 +39,168 @@ def analyze_image(image_path: str, prompt: str = "What's in this image?"):
     Returns:
         Claude's analysis of the image
     """
+    # Create message with image
+    message = client.messages.create(**_image_request_params(image_path, prompt))
+    return _response_text(message)
+
+
+def analyze_image_stream(image_path: str, prompt: str = "What's in this image?"):
+    """
+    Analyze an image like analyze_image, printing the response as it arrives.
+
+    Clients without a streaming API (the Gemini wrapper) print it once complete.
+
+    Args:
+        image_path: Path to the image file
+        prompt: Question or instruction about the image
+
+    Returns:
+        Claude's analysis of the image
+    """
+    params = _image_request_params(image_path, prompt)
+    if not hasattr(client.messages, "stream"):
+        response_text = _response_text(client.messages.create(**params))
+        print(response_text)
+        return response_text
+
+    with client.messages.stream(**params) as stream:
+        for text in stream.text_stream:
+            sys.stdout.write(text)
+            sys.stdout.flush()
+        print()
+        return stream.get_final_text()
+
+
+async def analyze_image_async(image_path: str, prompt: str = "What's in this image?"):
+    """
+    Async variant of analyze_image, on the shared async client.
+
+    Args:
+        image_path: Path to the image file
+        prompt: Question or instruction about the image
+
+    Returns:
+        Claude's analysis of the image
+    """
+    async_client = create_claude_client(async_=True)
+    source = await _image_source_async(async_client, image_path)
+    return await _analyze_source_async(async_client, source, prompt)
+
+
+async def _image_source_async(async_client, image_path: str) -> dict:
+    """Image source block for image_path: uploaded with USE_FILES_API, otherwise inline base64."""
+    if USE_FILES_API:
+        return {"type": "file", "file_id": await upload_image_async(async_client, image_path)}
+    # Decoding and encoding are CPU-bound, so keep them off the event loop
+    image_data, media_type = await asyncio.to_thread(load_and_encode_image, image_path)
+    return _base64_source(image_data, media_type)
+
+
+async def _analyze_source_async(async_client, source: dict, prompt: str) -> str:
+    """Send one prompt about an image source block and return the answer."""
+    params = _request_params(source, prompt)
+    if source["type"] == "file":
+        params["extra_headers"] = {"anthropic-beta": FILES_API_BETA}
+    message = await async_client.messages.create(**params)
+    return _response_text(message)
+
+
+async def analyze_images_concurrently(pairs: List[Tuple[str, str]],
+                                      max_concurrency: int = MAX_CONCURRENT_REQUESTS) -> List[str]:
+    """
+    Analyze several images at the same time, in real time.
+
+    Total time is about that of the slowest request rather than the sum of
+    all of them, and results come back in seconds (unlike the Message
+    Batches API). Each distinct image is encoded (or uploaded) once, and
+    every prompt about it reuses the same source block.
+
+    Args:
+        pairs: (image_path, prompt) tuples
+        max_concurrency: Maximum requests in flight at once
+
+    Returns:
+        Claude's analysis for each pair, in order (or an error message)
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    async_client = create_claude_client(async_=True)
+
+    async def load(image_path):
+        async with semaphore:
+            return await _image_source_async(async_client, image_path)
+
+    # One task per distinct image, awaited by every prompt about it
+    sources = {image_path: asyncio.ensure_future(load(image_path))
+               for image_path in dict.fromkeys(image_path for image_path, _ in pairs)}
+
+    async def analyze(image_path, prompt):
+        try:
+            source = await sources[image_path]
+            async with semaphore:
+                return await _analyze_source_async(async_client, source, prompt)
+        except Exception as e:
+            return f"Error: {e}"
+
+    return await asyncio.gather(*[analyze(image_path, prompt) for image_path, prompt in pairs])
+
+
+def run_concurrently(pairs: List[Tuple[str, str]]) -> List[str]:
+    """
+    Run analyze_images_concurrently from synchronous code.
+
+    Each call gets its own event loop, and the async client's connections
+    are closed on that loop before it ends.
+
+    Args:
+        pairs: (image_path, prompt) tuples
+
+    Returns:
+        Claude's analysis for each pair, in order (or an error message)
+    """
+    async def run():
+        try:
+            return await analyze_images_concurrently(pairs)
+        finally:
+            await close_async_clients()
+
+    return asyncio.run(run())
+
+
+def _image_request_params(image_path: str, prompt: str) -> dict:
+    """messages.create parameters for an image file and prompt."""
+    if USE_FILES_API:
+        # Uploaded once per file (HEIC converted first), then referenced by id
+        image = {"type": "file", "file_id": upload_image(client, image_path)}
+        params = _request_params(image, prompt)
+        params["extra_headers"] = {"anthropic-beta": FILES_API_BETA}
+        return params
+
     # Load and encode the image (handles HEIC conversion)
     image_data, media_type = load_and_encode_image(image_path)
+    return _request_params(_base64_source(image_data, media_type), prompt)
 
-    # Create message with image
-    message = client.messages.create(
-        model=MODEL_NAME,
-        max_tokens=2048,
-        messages=[
+
+def _base64_source(image_data: str, media_type: str) -> dict:
+    """Image source block carrying the image inline."""
+    return {
+        "type": "base64",
+        "media_type": media_type,
+        "data": image_data
+    }
+
+
+def _request_params(source: dict, prompt: str) -> dict:
+    """messages.create parameters for one image source and prompt."""
+    return {
+        "model": MODEL_NAME,
+        "max_tokens": 2048,
+        "messages": [
             {
                 "role": "user",
                 "content": [
                     {
                         "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": media_type,
-                            "data": image_data
-                        }
+                        "source": source
                     },
                     {
                         "type": "text",
@@ -48,72 +209,174 @@ def analyze_image(image_path: str, prompt: str = "What's in this image?"):
                 ]
             }
         ]
-    )
+    }
+
+
+def _response_text(message) -> str:
+    """Join the text blocks of a response."""
+    return "".join([block.text for block in message.content if block.type == "text"])
+
+
+def analyze_images_batch(pairs: List[Tuple[str, str]]) -> List[str]:
+    """
+    Analyze several images in one Message Batches submission.
+
+    Every (image, prompt) pair is its own request, but they are submitted
+    together and polled until the whole batch has finished, instead of one
+    round trip per image. Batches are half price but can take up to 24
+    hours, so this is for offline bulk work; use run_concurrently when
+    someone is waiting on the answers. A single pair uses analyze_image
+    directly, and providers without batch support run the pairs
+    concurrently instead.
+
+    Args:
+        pairs: (image_path, prompt) tuples
+
+    Returns:
+        Claude's analysis for each pair, in order (or an error message)
+    """
+    if len(pairs) == 1:
+        try:
+            return [analyze_image(*pairs[0])]
+        except Exception as e:
+            return [f"Error: {e}"]
+    if not BATCH_SUPPORTED:
+        return run_concurrently(pairs)
+
+    results = [None] * len(pairs)
+    requests = []
+    # Decode and encode every image up front, in parallel
+    images = load_and_encode_images([image_path for image_path, _ in pairs])
+    for i, ((_, prompt), image) in enumerate(zip(pairs, images)):
+        if isinstance(image, Exception):
+            results[i] = f"Error reading image: {image}"
+            continue
+        image_data, media_type = image
+        requests.append({"custom_id": str(i), "params": _request_params(_base64_source(image_data, media_type), prompt)})
+
+    if requests:
+        batch = client.messages.batches.create(requests=requests)
+        print(f"Submitted {len(requests)} request(s) as batch {batch.id}, waiting for results...")
+        while batch.processing_status != "ended":
+            time.sleep(BATCH_POLL_SECONDS)
+            batch = client.messages.batches.retrieve(batch.id)
+
+        for entry in client.messages.batches.results(batch.id):
+            i = int(entry.custom_id)
+            if entry.result.type == "succeeded":
+                results[i] = _response_text(entry.result.message)
+            else:
+                results[i] = f"Error: request {entry.result.type}"
+
+    return [result if result is not None else "Error: no result returned" for result in results]
 
-    # Extract response
-    response_text = ""
-    for block in message.content:
-        if hasattr(block, 'text'):
-            response_text += block.text
 
-    return response_text
+# Prompts for examples 1-5, each run against the image given on the command line
+EXAMPLE_PROMPTS = [
+    ("General Description", "Describe this image in detail"),
+    ("Object Detection", "List all objects you can identify in this image"),
+    ("Text Extraction (OCR)", "Extract all text from this image"),
+    ("Specific Questions", "How many people are in this image?"),
+    ("Scene Analysis", "What is the setting? Is this indoors or outdoors? Describe the atmosphere"),
+]
+
+
+def run_examples(image_path: str, sync: bool = False) -> List[str]:
+    """
+    Run the EXAMPLE_PROMPTS against one image.
+
+    The prompts are independent, so they are sent concurrently and take
+    about as long as the slowest one; with sync they run one after another.
+
+    Args:
+        image_path: Path to the image file
+        sync: Send the prompts one at a time with analyze_image
+
+    Returns:
+        Claude's answer to each prompt, in order (or an error message)
+    """
+    pairs = [(image_path, prompt) for _, prompt in EXAMPLE_PROMPTS]
+    if not sync:
+        return run_concurrently(pairs)
+    results = []
+    for pair in pairs:
+        try:
+            results.append(analyze_image(*pair))
+        except Exception as e:
+            results.append(f"Error: {e}")
+    return results
 
 
 def main():
     """
     Example usage of image recognition.
     """
-    print("=" * 60)
-    print("Claude Vision - Image Recognition Examples")
-    print("=" * 60)
-
-    # Example 1: General image description
-    print("\nExample 1: General Description")
-    print("-" * 60)
-    # result = analyze_image("path/to/your/image.jpg", "Describe this image in detail")
-    # print(result)
-    print("Uncomment the code above and provide an image path to test")
-
-    # Example 2: Object detection
-    print("\nExample 2: Object Detection")
-    print("-" * 60)
-    # result = analyze_image("path/to/your/image.jpg", "List all objects you can identify in this image")
-    # print(result)
-    print("Uncomment the code above and provide an image path to test")
-
-    # Example 3: Text extraction (OCR)
-    print("\nExample 3: Text Extraction (OCR)")
-    print("-" * 60)
-    # result = analyze_image("path/to/document.jpg", "Extract all text from this image")
-    # print(result)
-    print("Uncomment the code above and provide an image path to test")
-
-    # Example 4: Specific questions
-    print("\nExample 4: Specific Questions")
-    print("-" * 60)
-    # result = analyze_image("path/to/photo.jpg", "How many people are in this image?")
-    # print(result)
-    print("Uncomment the code above and provide an image path to test")
-
-    # Example 5: Scene analysis
-    print("\nExample 5: Scene Analysis")
-    print("-" * 60)
-    # result = analyze_image("path/to/scene.jpg", "What is the setting? Is this indoors or outdoors? Describe the atmosphere")
-    # print(result)
-    print("Uncomment the code above and provide an image path to test")
+    # Build the whole banner and write it once, instead of one print per line
+    lines = ["=" * 60, "Claude Vision - Image Recognition Examples", "=" * 60]
+
+    # Examples 1-5 run on the image given on the command line, e.g.
+    #   python image_recognition_example.py path/to/image.jpg [--sync]
+    image_args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    results = run_examples(image_args[0], sync="--sync" in sys.argv) if image_args else None
+    for i, (title, _) in enumerate(EXAMPLE_PROMPTS):
+        lines += ["", f"Example {i + 1}: {title}", "-" * 60]
+        lines.append(results[i] if results else
+                     "Pass an image path to test: python image_recognition_example.py path/to/image.jpg")
+
+    # Example 6: Several images at once
+    lines += ["", "Example 6: Batch Analysis", "-" * 60]
+    # lines += analyze_images_batch([
+    #     ("path/to/image1.jpg", "Describe this image in detail"),
+    #     ("path/to/image2.jpg", "Extract all text from this image"),
+    # ])
+    lines.append("Uncomment the code above and provide image paths to test")
 
     # Interactive mode
-    print("\n" + "=" * 60)
-    print("Interactive Image Analysis")
-    print("Type 'quit' to exit")
-    print("=" * 60)
+    lines += [
+        "",
+        "=" * 60,
+        "Interactive Image Analysis",
+        "Queue up images, then type 'run' to analyze them together",
+        "Type 'quit' to exit",
+        "=" * 60,
+    ]
+    sys.stdout.write("\n".join(lines) + "\n")
 
+    pending = []
     while True:
-        image_path = input("\nImage path (or 'quit'): ").strip()
+        image_path = input("\nImage path ('run' to analyze, 'quit' to exit): ").strip()
         if image_path.lower() in ['quit', 'exit', 'q']:
             print("Goodbye!")
             break
 
+        if image_path.lower() == 'run':
+            if not pending:
+                print("No images queued yet")
+                continue
+            print(f"\nAnalyzing {len(pending)} image(s)...")
+            if len(pending) == 1 and sys.stdout.isatty():
+                # A single image on a terminal: print the answer as it is generated
+                path, question = pending[0]
+                print("\n" + "-" * 60)
+                print(f"Analysis: {path}")
+                print("-" * 60)
+                try:
+                    analyze_image_stream(path, question)
+                except Exception as e:
+                    print(f"Error: {e}")
+                pending = []
+                continue
+            # Real-time requests side by side: the Message Batches API can take
+            # minutes to hours, which is no good for an interactive prompt
+            results = run_concurrently(pending)
+            for (path, _), result in zip(pending, results):
+                print("\n" + "-" * 60)
+                print(f"Analysis: {path}")
+                print("-" * 60)
+                print(result)
+            pending = []
+            continue
+
         if not os.path.exists(image_path):
             print(f"Error: File not found at {image_path}")
             continue
@@ -122,15 +385,8 @@ def main():
         if not question:
             question = "Describe this image in detail"
 
-        try:
-            print("\nAnalyzing image...")
-            result = analyze_image(image_path, question)
-            print("\n" + "-" * 60)
-            print("Analysis:")
-            print("-" * 60)
-            print(result)
-        except Exception as e:
-            print(f"Error: {e}")
+        pending.append((image_path, question))
+        print(f"Queued ({len(pending)} pending)")
 
 
 if __name__ == "__main__":
@@ -10,78 +10,67 @@ IMPORTANT PRIVACY NOTE:
 - Do not use for surveillance or unauthorized identification purposes
 """
 
+import functools
 import os
-from claude_client import create_claude_client, load_and_encode_image, get_model_name
+import sys
+from claude_client import (create_claude_client, load_and_encode_image, get_model_name,
+                           get_provider_name, upload_image, FILES_API_BETA)
 
 # Initialize Claude client (supports Anthropic API, Vertex AI, and Gemini)
 client = create_claude_client()
 MODEL_NAME = get_model_name()
 
+# Upload each image once through the Files API (CLAUDE_FILES_API=1, Anthropic API
+# only) and reference it by file_id instead of sending base64 with every request
+USE_FILES_API = os.environ.get("CLAUDE_FILES_API") == "1" and get_provider_name() == "anthropic"
 
-def analyze_people_in_image(image_path: str, analysis_type: str = "general"):
-    """
-    Analyze people in an image.
 
-    Args:
-        image_path: Path to the image file
-        analysis_type: Type of analysis to perform:
-            - "general": General description of people
-            - "count": Count number of people
-            - "activities": Describe what people are doing
-            - "detailed": Detailed description of each person
-            - "attributes": Describe clothing, poses, demographics
+def _image_source(image_path: str) -> dict:
+    """
+    Image source block for a request.
 
-    Returns:
-        Analysis results
+    With the Files API enabled the image is uploaded once (HEIC converted
+    first) and referenced by file_id, so asking several questions about the
+    same photo doesn't re-send it; otherwise it is sent inline as base64.
     """
-    # Define prompts for different analysis types
-    prompts = {
-        "general": "Describe the people in this image.",
-        "count": "How many people are in this image? Provide just the number and any relevant details about their positions.",
-        "activities": "What are the people in this image doing? Describe their activities and interactions.",
-        "detailed": """Analyze each person in this image and provide:
-1. A count of total people
-2. For each person, describe:
-   - Their approximate position in the image
-   - What they're doing
-   - Their clothing and appearance
-   - Any notable characteristics
-   - Their pose or body language""",
-        "attributes": """For the people in this image, describe:
-- Clothing and style
-- Approximate age ranges (child, teen, adult, elderly)
-- Poses and body language
-- Apparent emotions or expressions
-- Any accessories or distinctive features
-- Group dynamics if multiple people""",
-        "demographics": """Describe the people in this image in terms of:
-- Approximate count
-- Apparent age distribution
-- Gender presentation if relevant to the context
-- General appearance and style
-Note: Provide respectful, objective descriptions only."""
+    if USE_FILES_API:
+        return {"type": "file", "file_id": upload_image(client, image_path)}
+    # Read and encode image (handles HEIC conversion)
+    image_data, media_type = load_and_encode_image(image_path)
+    return {
+        "type": "base64",
+        "media_type": media_type,
+        "data": image_data
     }
 
-    prompt = prompts.get(analysis_type, prompts["general"])
 
-    # Read and encode image (handles HEIC conversion)
-    image_data, media_type = load_and_encode_image(image_path)
+def _call_vision(image_path: str, prompt: str, max_tokens: int = 2048,
+                 stream: bool = False) -> str:
+    """
+    Ask Claude a question about an image.
 
-    # Call Claude with vision
-    message = client.messages.create(
+    Args:
+        image_path: Path to the image file
+        prompt: Question or instruction about the image
+        max_tokens: Maximum response length
+        stream: Print the response as it arrives (clients without a
+            streaming API, such as the Gemini wrapper, print it once complete)
+
+    Returns:
+        Claude's response text
+    """
+    # Requests referencing uploaded files need the Files API beta header
+    extra = {"extra_headers": {"anthropic-beta": FILES_API_BETA}} if USE_FILES_API else {}
+    params = dict(
         model=MODEL_NAME,
-        max_tokens=2048,
+        max_tokens=max_tokens,
         messages=[
             {
                 "role": "user",
                 "content": [
                     {
                         "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": media_type,
-                            "data": image_data
-                        }
+                        "source": _image_source(image_path)
                     },
                     {
                         "type": "text",
@@ -89,23 +78,55 @@ Note: Provide respectful, objective descriptions only."""
                     }
                 ]
             }
-        ]
+        ],
+        **extra
     )
 
-    # Extract response
-    response_text = ""
-    for block in message.content:
-        if hasattr(block, 'text'):
-            response_text += block.text
-
+    if stream and hasattr(client.messages, "stream"):
+        with client.messages.stream(**params) as response:
+            for text in response.text_stream:
+                sys.stdout.write(text)
+                sys.stdout.flush()
+            print()
+            return response.get_final_text()
+
+    message = client.messages.create(**params)
+    response_text = "".join(block.text for block in message.content if block.type == "text")
+    if stream:
+        print(response_text)
     return response_text
 
 
-def detect_faces(image_path: str):
-    """
-    Detect and describe faces in an image.
-    """
-    prompt = """Analyze the faces in this image:
+# Prompts for analyze_people_in_image, by analysis type
+_ANALYSIS_PROMPTS = {
+    "general": "Describe the people in this image.",
+    "count": "How many people are in this image? Provide just the number and any relevant details about their positions.",
+    "activities": "What are the people in this image doing? Describe their activities and interactions.",
+    "detailed": """Analyze each person in this image and provide:
+1. A count of total people
+2. For each person, describe:
+   - Their approximate position in the image
+   - What they're doing
+   - Their clothing and appearance
+   - Any notable characteristics
+   - Their pose or body language""",
+    "attributes": """For the people in this image, describe:
+- Clothing and style
+- Approximate age ranges (child, teen, adult, elderly)
+- Poses and body language
+- Apparent emotions or expressions
+- Any accessories or distinctive features
+- Group dynamics if multiple people""",
+    "demographics": """Describe the people in this image in terms of:
+- Approximate count
+- Apparent age distribution
+- Gender presentation if relevant to the context
+- General appearance and style
+Note: Provide respectful, objective descriptions only."""
+}
+
+# Prompts for detect_faces and analyze_group_dynamics
+_FACE_PROMPT = """Analyze the faces in this image:
 1. How many faces can you see?
 2. For each face, describe:
    - Approximate age
@@ -116,86 +137,64 @@ def detect_faces(image_path: str):
 
 Provide objective, respectful descriptions only."""
 
-    # Load and encode image (handles HEIC conversion)
-    image_data, media_type = load_and_encode_image(image_path)
+_GROUP_PROMPT = """Analyze the group dynamics in this image:
+1. How many people are present?
+2. How are they positioned relative to each other?
+3. What interactions or relationships can you infer?
+4. What is the apparent social context (meeting, party, family gathering, etc.)?
+5. What is the overall mood or atmosphere?
+6. Are there any notable group behaviors or activities?"""
 
-    message = client.messages.create(
-        model=MODEL_NAME,
-        max_tokens=2048,
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": media_type,
-                            "data": image_data
-                        }
-                    },
-                    {
-                        "type": "text",
-                        "text": prompt
-                    }
-                ]
-            }
-        ]
-    )
 
-    response_text = ""
-    for block in message.content:
-        if hasattr(block, 'text'):
-            response_text += block.text
+def analyze_people_in_image(image_path: str, analysis_type: str = "general", stream: bool = False):
+    """
+    Analyze people in an image.
 
-    return response_text
+    Args:
+        image_path: Path to the image file
+        analysis_type: Type of analysis to perform:
+            - "general": General description of people
+            - "count": Count number of people
+            - "activities": Describe what people are doing
+            - "detailed": Detailed description of each person
+            - "attributes": Describe clothing, poses, demographics
+        stream: Also print the response as it arrives
+
+    Returns:
+        Analysis results
+    """
+    prompt = _ANALYSIS_PROMPTS.get(analysis_type, _ANALYSIS_PROMPTS["general"])
+    return _call_vision(image_path, prompt, stream=stream)
 
 
-def analyze_group_dynamics(image_path: str):
+def detect_faces(image_path: str, stream: bool = False):
     """
-    Analyze interactions and dynamics between people.
+    Detect and describe faces in an image.
+
+    With stream set, the response is also printed as it arrives.
     """
-    prompt = """Analyze the group dynamics in this image:
-1. How many people are present?
-2. How are they positioned relative to each other?
-3. What interactions or relationships can you infer?
-4. What is the apparent social context (meeting, party, family gathering, etc.)?
-5. What is the overall mood or atmosphere?
-6. Are there any notable group behaviors or activities?"""
+    return _call_vision(image_path, _FACE_PROMPT, stream=stream)
 
-    # Load and encode image (handles HEIC conversion)
-    image_data, media_type = load_and_encode_image(image_path)
 
-    message = client.messages.create(
-        model=MODEL_NAME,
-        max_tokens=2048,
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": media_type,
-                            "data": image_data
-                        }
-                    },
-                    {
-                        "type": "text",
-                        "text": prompt
-                    }
-                ]
-            }
-        ]
-    )
+def analyze_group_dynamics(image_path: str, stream: bool = False):
+    """
+    Analyze interactions and dynamics between people.
 
-    response_text = ""
-    for block in message.content:
-        if hasattr(block, 'text'):
-            response_text += block.text
+    With stream set, the response is also printed as it arrives.
+    """
+    return _call_vision(image_path, _GROUP_PROMPT, stream=stream)
 
-    return response_text
+
+# Menu choice -> analysis; each handler takes (image_path, stream=...).
+# Choice 7 (custom question) needs the question, so main() handles it directly
+_DISPATCH = {
+    "1": functools.partial(analyze_people_in_image, analysis_type="count"),
+    "2": functools.partial(analyze_people_in_image, analysis_type="activities"),
+    "3": functools.partial(analyze_people_in_image, analysis_type="detailed"),
+    "4": functools.partial(analyze_people_in_image, analysis_type="attributes"),
+    "5": detect_faces,
+    "6": analyze_group_dynamics,
+}
 
 
 def main():
@@ -236,68 +235,38 @@ def main():
             print("Goodbye!")
             break
 
+        handler = _DISPATCH.get(choice)
+        if handler is None and choice != "7":
+            print("Invalid choice")
+            continue
+
         image_path = input("Image path: ").strip()
 
         if not os.path.exists(image_path):
             print(f"Error: File not found at {image_path}")
             continue
 
+        if handler is None:
+            question = input("Your question: ").strip()
+
+        # On a terminal, print the answer as it is generated instead of
+        # waiting for the whole response
+        stream = sys.stdout.isatty()
+        header = "\n".join(["-" * 70, "Analysis Result:", "-" * 70])
+
         try:
             print("\nAnalyzing image...\n")
+            if stream:
+                print(header)
 
-            if choice == "1":
-                result = analyze_people_in_image(image_path, "count")
-            elif choice == "2":
-                result = analyze_people_in_image(image_path, "activities")
-            elif choice == "3":
-                result = analyze_people_in_image(image_path, "detailed")
-            elif choice == "4":
-                result = analyze_people_in_image(image_path, "attributes")
-            elif choice == "5":
-                result = detect_faces(image_path)
-            elif choice == "6":
-                result = analyze_group_dynamics(image_path)
-            elif choice == "7":
-                question = input("Your question: ").strip()
-                # Load and encode image (handles HEIC conversion)
-                image_data, media_type = load_and_encode_image(image_path)
-
-                message = client.messages.create(
-                    model=MODEL_NAME,
-                    max_tokens=2048,
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "image",
-                                    "source": {
-                                        "type": "base64",
-                                        "media_type": media_type,
-                                        "data": image_data
-                                    }
-                                },
-                                {
-                                    "type": "text",
-                                    "text": question
-                                }
-                            ]
-                        }
-                    ]
-                )
-
-                result = ""
-                for block in message.content:
-                    if hasattr(block, 'text'):
-                        result += block.text
+            if handler is not None:
+                result = handler(image_path, stream=stream)
             else:
-                print("Invalid choice")
-                continue
+                result = _call_vision(image_path, question, stream=stream)
 
-            print("-" * 70)
-            print("Analysis Result:")
-            print("-" * 70)
-            print(result)
+            if not stream:
+                print(header)
+                print(result)
             print("-" * 70)
 
         except Exception as e:
@@ -1,146 +1,177 @@
 #!/usr/bin/env python3
 """
 Test HEIC support in the face identification agent.
+
+Run with: pytest test_heic_support.py (or python test_heic_support.py)
 """
 
-import os
+import io
 import sys
 
-print("=" * 70)
-print("Testing HEIC Support")
-print("=" * 70)
+import pytest
+
+MODULE_NAMES = ["agent", "face_identification", "people_recognition", "image_recognition_example"]
+
+
+def test_imports():
+    """PIL and pillow-heif are installed."""
+    from PIL import Image  # noqa: F401
+    import pillow_heif  # noqa: F401
 
-# Test 1: Import dependencies
-print("\n1. Testing imports...")
-try:
+
+def test_heif_registration():
+    """claude_client registers the HEIF opener with PIL (once per process)."""
     from PIL import Image
+    import claude_client
+
+    claude_client._pillow_heif()
+    assert '.heic' in Image.registered_extensions(), "HEIC not registered with PIL"
+
+
+@pytest.mark.parametrize("name", MODULE_NAMES)
+def test_module_loads(modules, name):
+    """Every agent module imports cleanly."""
+    assert getattr(modules, name) is not None
+
+
+@pytest.mark.parametrize("name", MODULE_NAMES)
+def test_load_and_encode_image_available(modules, name):
+    """load_and_encode_image is available in every module that sends images."""
+    assert hasattr(getattr(modules, name), 'load_and_encode_image')
+
+
+@pytest.mark.parametrize("extension", ["heic", "heif", "HEIC"])
+def test_heif_media_type(extension):
+    """HEIC/HEIF extensions map to JPEG, the format they are converted to."""
+    from claude_client import get_image_media_type
+
+    assert get_image_media_type(extension) == "image/jpeg"
+
+
+def test_heic_conversion(tmp_path):
+    """A HEIC file is converted to JPEG before it is sent."""
     import pillow_heif
-    print("   ✅ PIL and pillow-heif imported successfully")
-except ImportError as e:
-    print(f"   ❌ Import error: {e}")
-    sys.exit(1)
-
-# Test 2: Register HEIF opener
-print("\n2. Testing HEIF registration...")
-try:
-    pillow_heif.register_heif_opener()
-    print("   ✅ HEIF opener registered with PIL")
-except Exception as e:
-    print(f"   ❌ Registration error: {e}")
-    sys.exit(1)
-
-# Test 3: Check agent imports
-print("\n3. Testing agent module imports...")
-try:
-    import agent
-    print("   ✅ agent.py loaded successfully")
-except Exception as e:
-    print(f"   ❌ Error loading agent.py: {e}")
-    sys.exit(1)
-
-# Test 4: Check face_identification imports
-print("\n4. Testing face_identification module imports...")
-try:
-    import face_identification
-    print("   ✅ face_identification.py loaded successfully")
-except Exception as e:
-    print(f"   ❌ Error loading face_identification.py: {e}")
-    sys.exit(1)
-
-# Test 5: Check people_recognition imports
-print("\n5. Testing people_recognition module imports...")
-try:
-    import people_recognition
-    print("   ✅ people_recognition.py loaded successfully")
-except Exception as e:
-    print(f"   ❌ Error loading people_recognition.py: {e}")
-    sys.exit(1)
-
-# Test 6: Check image_recognition_example imports
-print("\n6. Testing image_recognition_example module imports...")
-try:
-    import image_recognition_example
-    print("   ✅ image_recognition_example.py loaded successfully")
-except Exception as e:
-    print(f"   ❌ Error loading image_recognition_example.py: {e}")
-    sys.exit(1)
-
-# Test 7: Verify load_and_encode_image function exists
-print("\n7. Testing load_and_encode_image function...")
-try:
-    assert hasattr(agent, 'load_and_encode_image')
-    assert hasattr(face_identification, 'load_and_encode_image')
-    assert hasattr(people_recognition, 'load_and_encode_image')
-    assert hasattr(image_recognition_example, 'load_and_encode_image')
-    print("   ✅ load_and_encode_image function exists in all modules")
-except AssertionError:
-    print("   ❌ load_and_encode_image function not found in all modules")
-    sys.exit(1)
-
-# Test 8: Check HEIC in media types
-print("\n8. Testing HEIC media type recognition...")
-try:
-    media_type = agent.get_image_media_type("test.heic")
-    assert media_type == "image/jpeg", f"Expected 'image/jpeg', got '{media_type}'"
-    print("   ✅ HEIC files recognized and mapped to JPEG")
-except Exception as e:
-    print(f"   ❌ Error: {e}")
-    sys.exit(1)
-
-# Test 9: Check HEIF in media types
-print("\n9. Testing HEIF media type recognition...")
-try:
-    media_type = agent.get_image_media_type("test.heif")
-    assert media_type == "image/jpeg", f"Expected 'image/jpeg', got '{media_type}'"
-    print("   ✅ HEIF files recognized and mapped to JPEG")
-except Exception as e:
-    print(f"   ❌ Error: {e}")
-    sys.exit(1)
-
-# Test 10: Test conversion logic (without actual file)
-print("\n10. Testing HEIC conversion logic...")
-print("    Note: Actual file conversion requires a real HEIC image file")
-print("    The conversion code is in place and will work when a HEIC file is provided")
-print("    ✅ Conversion logic implemented")
-
-print("\n" + "=" * 70)
-print("✅ ALL HEIC SUPPORT TESTS PASSED!")
-print("=" * 70)
-
-print("\n📋 Summary:")
-print("-" * 70)
-print("✅ PIL and pillow-heif libraries installed")
-print("✅ HEIF opener registered")
-print("✅ All agent modules load correctly")
-print("✅ load_and_encode_image function available")
-print("✅ HEIC/HEIF extensions recognized")
-print("✅ Automatic JPEG conversion configured")
-
-print("\n🎯 What This Means:")
-print("-" * 70)
-print("Your agent now supports HEIC images from Apple devices!")
-print()
-print("Supported formats:")
-print("  • JPEG (.jpg, .jpeg)")
-print("  • PNG (.png)")
-print("  • GIF (.gif)")
-print("  • WebP (.webp)")
-print("  • HEIC (.heic, .heif) ← NEW!")
-print()
-print("HEIC files are automatically converted to JPEG before sending to")
-print("Claude's API, ensuring compatibility while supporting the format")
-print("used by iPhones and iPads.")
-
-print("\n🚀 Next Steps:")
-print("-" * 70)
-print("1. Test with a real HEIC file from your iPhone/iPad")
-print("2. Use any agent tool (all support HEIC now):")
-print("   python agent.py")
-print("   python face_identification.py")
-print("   python people_recognition.py")
-print()
-print("Example:")
-print("   python agent.py")
-print("   You: Who is in ./IMG_1234.HEIC?")
-
-print("\n" + "=" * 70)
+    import pybase64
+    from PIL import Image
+    from claude_client import load_and_encode_image
+
+    path = tmp_path / "photo.heic"
+    pillow_heif.from_pillow(Image.new("RGB", (64, 48), (200, 120, 40))).save(path)
+
+    image_data, media_type = load_and_encode_image(str(path))
+
+    assert media_type == "image/jpeg"
+    with Image.open(io.BytesIO(pybase64.b64decode(image_data))) as img:
+        assert img.format == "JPEG"
+        assert img.size == (64, 48)
+
+
+def _ftyp(major, *compatible):
+    """An ISO-BMFF ftyp box with the given brands."""
+    import struct
+
+    return struct.pack(">I", 16 + 4 * len(compatible)) + b"ftyp" + major + bytes(4) + b"".join(compatible)
+
+
+@pytest.mark.parametrize("header, expected", [
+    (_ftyp(b"heic", b"mif1", b"heic"), True),
+    (_ftyp(b"mif1", b"heic"), True),
+    (_ftyp(b"mif1"), True),
+    (_ftyp(b"hevc", b"msf1", b"hevc"), True),
+    (_ftyp(b"avif", b"mif1", b"miaf"), False),
+    (_ftyp(b"mif1", b"avif", b"miaf"), False),
+    (_ftyp(b"msf1", b"avis", b"msf1"), False),
+    (_ftyp(b"isom", b"mp41"), False),
+    (b"\xff\xd8\xff\xe0" + bytes(12), False),
+])
+def test_is_heif(tmp_path, header, expected):
+    """HEIC is recognised by its ftyp brands, and AVIF in the same container is not."""
+    from claude_client import _is_heif
+
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(header + bytes(32))
+
+    assert _is_heif(str(path)) is expected
+
+
+PROBE_FORMATS = {
+    "png": ("PNG", "RGB", {}),
+    "gif": ("GIF", "P", {}),
+    "webp-vp8": ("WEBP", "RGB", {}),
+    "webp-vp8l": ("WEBP", "RGB", {"lossless": True}),
+    "webp-vp8x": ("WEBP", "RGBA", {}),
+    "jpeg": ("JPEG", "RGB", {}),
+    "jpeg-progressive": ("JPEG", "RGB", {"progressive": True}),
+    "jpeg-cmyk": ("JPEG", "CMYK", {}),
+    "jpeg-exif": ("JPEG", "RGB", {"exif": b"Exif\x00\x00" + bytes(64)}),
+}
+
+
+def _save_image(path, name, size=(123, 45)):
+    from PIL import Image
+
+    image_format, mode, options = PROBE_FORMATS[name]
+    Image.new(mode, size).save(path, image_format, **options)
+
+
+@pytest.mark.parametrize("name", PROBE_FORMATS)
+def test_probe_image_size(tmp_path, name):
+    """Header-only dimensions agree with what PIL reads."""
+    from PIL import Image
+    from claude_client import _probe_image_size
+
+    path = tmp_path / "image"
+    _save_image(path, name)
+
+    with Image.open(path) as img:
+        assert _probe_image_size(str(path)) == img.size
+
+
+@pytest.mark.parametrize("name", PROBE_FORMATS)
+@pytest.mark.parametrize("length", [1, 3, 11, 20, 29])
+def test_probe_image_size_truncated(tmp_path, name, length):
+    """A truncated file yields None (so PIL decides) or the right size, never an error."""
+    from claude_client import _probe_image_size
+
+    path = tmp_path / "image"
+    _save_image(path, name)
+    path.write_bytes(path.read_bytes()[:length])
+
+    assert _probe_image_size(str(path)) in (None, (123, 45))
+
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"not an image at all",
+    b"\xff\xd8\xff\xff\xff",
+    b"\xff\xd8\xff\xe0\x00\x00garbage",
+    b"\xff\xd8\xff\xe0\x00\x10" + bytes(14) + b"\x12\x34",
+])
+def test_probe_image_size_garbage(tmp_path, data):
+    """Unrecognised or corrupt headers yield None."""
+    from claude_client import _probe_image_size
+
+    path = tmp_path / "image.jpg"
+    path.write_bytes(data)
+
+    assert _probe_image_size(str(path)) is None
+
+
+def test_unprobed_format_falls_back_to_pil(tmp_path):
+    """Formats the header probe doesn't know are still measured by PIL."""
+    import pybase64
+    from PIL import Image
+    from claude_client import _probe_image_size, load_and_encode_image
+
+    path = tmp_path / "photo.bmp"
+    Image.new("RGB", (64, 48)).save(path)
+    assert _probe_image_size(str(path)) is None
+
+    image_data, media_type = load_and_encode_image(str(path), max_dimension=32)
+
+    with Image.open(io.BytesIO(pybase64.b64decode(image_data))) as img:
+        assert max(img.size) == 32
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
@@ -1,119 +1,246 @@
 #!/usr/bin/env python3
 """
-Test script to demonstrate the face identification interface without API calls.
+Test the face identification interface without API calls.
+
+Run with: pytest test_interface.py (or python test_interface.py)
 """
 
-print("=" * 70)
-print("✅ Face Identification System - Interface Test")
-print("=" * 70)
-
-print("\n1. Testing imports...")
-try:
-    import os
-    import json
-    import base64
-    from pathlib import Path
-    print("   ✅ Standard library imports successful")
-except Exception as e:
-    print(f"   ❌ Error: {e}")
-    exit(1)
-
-try:
-    from claude_client import create_claude_client
-    print("   ✅ Claude client module imported successfully")
-except Exception as e:
-    print(f"   ❌ Error importing claude_client: {e}")
-    exit(1)
-
-try:
-    from dotenv import load_dotenv
-    print("   ✅ python-dotenv imported successfully")
-except Exception as e:
-    print(f"   ❌ Error importing dotenv: {e}")
-    exit(1)
-
-print("\n2. Testing face identification module...")
-try:
-    import face_identification
-    print("   ✅ face_identification.py loaded successfully")
-except Exception as e:
-    print(f"   ❌ Error: {e}")
-    exit(1)
-
-print("\n3. Testing main agent module...")
-try:
-    import agent
-    print("   ✅ agent.py loaded successfully")
-except Exception as e:
-    print(f"   ❌ Error: {e}")
-    exit(1)
-
-print("\n4. Testing people recognition module...")
-try:
-    import people_recognition
-    print("   ✅ people_recognition.py loaded successfully")
-except Exception as e:
-    print(f"   ❌ Error: {e}")
-    exit(1)
-
-print("\n5. Checking database structure...")
-database_file = "face_database.json"
-if os.path.exists(database_file):
-    try:
-        with open(database_file, 'r') as f:
-            db = json.load(f)
-        print(f"   ✅ Database found with {len(db.get('people', []))} people")
-    except Exception as e:
-        print(f"   ⚠️  Database file exists but has errors: {e}")
-else:
-    print("   ℹ️  No database yet (run face_identification.py to create)")
-
-print("\n6. Checking agent tools...")
-try:
-    from agent import TOOLS
-    tool_names = [tool['name'] for tool in TOOLS]
-    print(f"   ✅ Agent has {len(TOOLS)} tools:")
-    for name in tool_names:
-        print(f"      • {name}")
-
-    if 'identify_person' in tool_names:
-        print("   ✅ Face identification tool is registered!")
-    else:
-        print("   ❌ Face identification tool not found")
-except Exception as e:
-    print(f"   ❌ Error checking tools: {e}")
-
-print("\n" + "=" * 70)
-print("✅ ALL TESTS PASSED!")
-print("=" * 70)
-
-print("\n📋 System Status:")
-print("-" * 70)
-print("✅ All Python modules load correctly")
-print("✅ Dependencies installed (anthropic, python-dotenv)")
-print("✅ Face identification system ready")
-print("✅ Main agent integrated with face ID tool")
-print("✅ People recognition system ready")
-
-print("\n🚀 Next Steps:")
-print("-" * 70)
-print("1. Set up your API key:")
-print("   cp .env.example .env")
-print("   # Edit .env and add your ANTHROPIC_API_KEY")
-print()
-print("2. Try the face identification tool:")
-print("   source venv/bin/activate  # Activate virtual environment")
-print("   python face_identification.py")
-print()
-print("3. Or use the AI agent:")
-print("   source venv/bin/activate")
-print("   python agent.py")
-print()
-print("4. Read the documentation:")
-print("   - QUICKSTART.md (5-minute guide)")
-print("   - FACE_IDENTIFICATION_GUIDE.md (complete reference)")
-print("   - PEOPLE_RECOGNITION_GUIDE.md (people detection)")
-
-print("\n" + "=" * 70)
-print("System ready! Install your API key to start using it.")
-print("=" * 70)
+import importlib
+import sys
+
+import orjson
+import pytest
+
+MODULE_NAMES = ["face_identification", "agent", "people_recognition"]
+
+
+def test_dependencies_import():
+    """The Claude client module and python-dotenv are importable."""
+    from claude_client import create_claude_client  # noqa: F401
+    from dotenv import load_dotenv  # noqa: F401
+
+
+@pytest.mark.parametrize("name", MODULE_NAMES)
+def test_module_imports(name):
+    """Each module imports on its own, so an import error is reported here."""
+    importlib.import_module(name)
+
+
+@pytest.mark.parametrize("name", MODULE_NAMES)
+def test_module_loads(modules, name):
+    """The face identification, agent and people recognition modules import cleanly."""
+    assert getattr(modules, name) is not None
+
+
+@pytest.fixture
+def face_db(modules, tmp_path, monkeypatch):
+    """Point the face database files at tmp_path, with fresh database caches."""
+    fi = modules.face_identification
+    monkeypatch.setattr(fi, "DATABASE_FILE", str(tmp_path / "face.db"))
+    monkeypatch.setattr(fi, "LEGACY_DATABASE_FILE", str(tmp_path / "face_database.json"))
+    monkeypatch.setattr(fi, "LEGACY_EMBEDDINGS_FILE", str(tmp_path / "face_database.npy"))
+    monkeypatch.setattr(fi, "VECTORS_FILE", str(tmp_path / "face_vectors.npy"))
+    monkeypatch.setattr(fi, "FACE_INDEX_FILE", str(tmp_path / "face.index"))
+    caches = [fi._read_database, fi._load_embeddings, fi._reference_prompt]
+    for cache in caches:
+        cache.cache_clear()
+    yield fi
+    for cache in caches:
+        cache.cache_clear()
+
+
+def test_database_loads(face_db, tmp_path):
+    """A legacy JSON database is imported into SQLite and read back."""
+    (tmp_path / "face_database.json").write_bytes(orjson.dumps({"people": [{
+        "name": "Alice",
+        "reference_image": "alice.jpg",
+        "facial_description": "Short dark hair, round glasses",
+        "notes": "",
+        "added_date": "2024-01-01T00:00:00",
+    }]}))
+
+    db = face_db.load_database()
+
+    assert (tmp_path / "face.db").exists()
+    assert db.names == ("Alice",)
+    assert db.index_of("alice") == 0
+    assert db.descriptions[0] == "Short dark hair, round glasses"
+
+
+def test_identification_blocks(face_db, tmp_path):
+    """The reference block lists each described person; the instructions follow the image."""
+    photo = tmp_path / "alice.jpg"
+    photo.write_bytes(b"")
+    face_db._insert_people([face_db._person_entry(
+        "Alice", str(photo), "", {"facial_description": "Short dark hair, round glasses"})])
+
+    reference, instructions = face_db.identification_blocks()
+
+    assert "Alice:\nShort dark hair, round glasses" in reference["text"]
+    assert "cache_control" not in reference
+    assert instructions == {"type": "text", "text": face_db.IDENTIFICATION_INSTRUCTIONS}
+
+    # Any write changes the database's (mtime_ns, size) key, so the cached text is rebuilt
+    face_db._insert_people([face_db._person_entry("Bob", str(photo), "", {"facial_description": "Beard"})])
+    reference, _ = face_db.identification_blocks()
+    assert "Bob:\nBeard" in reference["text"]
+
+
+def test_identify_without_database(modules, face_db, tmp_path):
+    """The identify_person tool reports a missing database without creating one."""
+    import asyncio
+
+    result = asyncio.run(modules.agent.identify_people_from_database(str(tmp_path / "photo.jpg")))
+
+    assert result.startswith("Face database not found")
+    assert not (tmp_path / "face.db").exists()
+
+
+def _clustered_embeddings(count, dim=64, cluster_size=16, queries=10):
+    """
+    Normalized embeddings in tight clusters, plus one query per cluster centre.
+
+    A query's cluster fits in the re-ranking shortlist and scores far above
+    every other cluster, so even the approximate indexes must return the
+    exact top-k for k up to cluster_size.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    centres = rng.standard_normal((count // cluster_size + 1, dim))
+    centres /= np.linalg.norm(centres, axis=1, keepdims=True)
+    matrix = centres[np.arange(count) % len(centres)] + 0.3 * rng.standard_normal((count, dim)) / dim ** 0.5
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix.astype(np.float32), centres[:queries].astype(np.float32)
+
+
+def _brute_force(matrix, queries, k):
+    import numpy as np
+
+    scores = queries @ matrix.T
+    ids = np.argsort(-scores, axis=1)[:, :k]
+    return np.take_along_axis(scores, ids, axis=1), ids
+
+
+@pytest.fixture
+def small_pq(monkeypatch):
+    """Shrink the IndexPQ codebooks so the PQ branch trains in well under a second."""
+    import face_index
+
+    monkeypatch.setattr(face_index, "PQ_SUBVECTORS", 16)
+    monkeypatch.setattr(face_index, "PQ_BITS", 4)
+    monkeypatch.setattr(face_index, "PQ_MIN_VECTORS", 39 * 2 ** 4)
+
+
+@pytest.mark.parametrize("count, index_type", [
+    (100, "IndexFlatIP"),
+    (3, "IndexFlatIP"),
+    (2048, "IndexHNSWFlat"),
+    (624, "IndexPQ"),
+])
+@pytest.mark.parametrize("k", [1, 5, 16])
+def test_face_index_matches_brute_force(request, count, index_type, k):
+    """Every index type returns the exact top-k, including k above the index size."""
+    import numpy as np
+    from face_index import FaceIndex
+
+    if index_type == "IndexPQ":
+        request.getfixturevalue("small_pq")
+    matrix, queries = _clustered_embeddings(count)
+    index = FaceIndex.build(matrix)
+    assert type(index.index).__name__ == index_type
+
+    scores, ids = index.search(queries, k)
+    expected_scores, expected_ids = _brute_force(matrix, queries, k)
+
+    assert ids.shape == (len(queries), min(k, count))
+    np.testing.assert_array_equal(ids, expected_ids)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-5, atol=1e-5)
+
+
+@pytest.mark.parametrize("k", [1, 5, 200])
+def test_face_index_numpy_fallback(monkeypatch, k):
+    """Without faiss the NumPy product gives the same results."""
+    import numpy as np
+    import face_index
+
+    monkeypatch.setattr(face_index, "faiss_available", lambda: False)
+    matrix, queries = _clustered_embeddings(100)
+    index = face_index.FaceIndex.build(matrix)
+    assert index.index is None
+
+    scores, ids = index.search(queries, k)
+    expected_scores, expected_ids = _brute_force(matrix, queries, k)
+
+    np.testing.assert_array_equal(ids, expected_ids)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-5, atol=1e-5)
+
+
+def test_face_index_masks_padding():
+    """Shortlist slots FAISS pads with -1 are never ranked above real matches."""
+    import faiss
+    import numpy as np
+    from face_index import FaceIndex
+
+    matrix, queries = _clustered_embeddings(10)
+    # A graph holding only some of the stored rows pads its shortlist with -1
+    graph = faiss.IndexHNSWFlat(matrix.shape[1], 4, faiss.METRIC_INNER_PRODUCT)
+    graph.add(matrix[:3])
+
+    scores, ids = FaceIndex(matrix, graph).search(queries, 5)
+    expected_scores, expected_ids = _brute_force(matrix[:3], queries, 3)
+
+    np.testing.assert_array_equal(ids[:, :3], expected_ids)
+    np.testing.assert_allclose(scores[:, :3], expected_scores, rtol=1e-5, atol=1e-5)
+    assert (ids[:, 3:] == -1).all()
+    assert np.isneginf(scores[:, 3:]).all()
+
+
+def test_identify_person_tool_registered(modules):
+    """The agent exposes the face identification tool."""
+    tool_names = [tool['name'] for tool in modules.agent.TOOLS]
+    assert 'identify_person' in tool_names
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("157 * 23", 3611),
+    ("(20 * 9/5) + 32", 68.0),
+    ("sqrt(16) + math.floor(2.5)", 6.0),
+    ("2 ** -3", 0.125),
+])
+def test_calculate(modules, expression, expected):
+    """The calculate tool evaluates arithmetic and whitelisted math functions."""
+    assert modules.agent._calculate({"expression": expression}) == f"Result: {expected}"
+
+
+@pytest.mark.parametrize("expression", [
+    "9 ** 9 ** 9",
+    "(9 ** 9999) ** 9999",
+    "10 ** 4000 * 10 ** 4000",
+    "factorial(10 ** 6)",
+    "math.comb(10 ** 6, 5000)",
+    "math.prod",
+    "sqrt",
+    "round(pi, 2) == 3.14",
+    "__import__('os')",
+    "().__class__",
+])
+def test_calculate_rejects_unsafe_expressions(modules, expression):
+    """Oversized integers, unlisted functions and non-numeric results are errors."""
+    assert modules.agent._calculate({"expression": expression}).startswith("Error calculating")
+
+
+@pytest.mark.parametrize("response, expected", [
+    ('["5754", "68°F"]', ["5754", "68°F"]),
+    ('Here you go:\n["5754", 68]', ["5754", "68"]),
+    ('["only one"]', None),
+    ('5754 and 68°F', None),
+    ('["unterminated", ]', None),
+])
+def test_parse_batch_answers(modules, response, expected):
+    """Marshaled replies parse to one answer per question, or None to fall back."""
+    assert modules.agent._parse_batch_answers(response, 2) == expected
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))